@@ -1,10 +1,56 @@
-from flask import Flask, jsonify
+import os
+from flask import Flask, Response, jsonify
+from chat import main, readiness, warm_up as warm_up_services
+import metrics
 
-app = Flask(__name__)
 
-@app.route("/")
-def hello():
-    return "Hello, World!"
+def create_app(warm_up=None):
+    """
+    App factory. Importing this module or building the app does no network
+    I/O; pass warm_up=True (or set WARM_UP=1) to initialize the model,
+    Firestore client and caches before serving. serve.py runs it under
+    gunicorn for production.
+    """
+    app = Flask(__name__)
+    app.register_blueprint(main)
+
+    @app.route("/")
+    def hello():
+        return "Hello, World!"
+
+    @app.route("/readyz")
+    def readyz():
+        status = readiness()
+        return jsonify(status), 200 if status["ready"] else 503
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    if warm_up is None:
+        warm_up = os.getenv("WARM_UP") == "1"
+    if warm_up:
+        warm_up_services()
+    return app
+
+
+_app = None
+
+
+def __getattr__(name):
+    """
+    Module-level `app` for `gunicorn app:app` / `flask run`, built on first
+    access. serve.py only imports create_app, so WARM_UP=1 never warms gRPC
+    clients up in gunicorn's preload master, before the fork.
+    """
+    global _app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _app is None:
+        _app = create_app()
+    return _app
+
 
 if __name__ == "__main__":
-  app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+  # Development server only; use `python serve.py` in production
+  create_app().run(host='0.0.0.0', port=int(os.getenv("PORT", "5000")), debug=os.getenv("FLASK_DEBUG") == "1")
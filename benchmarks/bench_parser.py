@@ -0,0 +1,74 @@
+"""
+Compares card-parsing backends on the saved Toyota fixture page.
+
+    python -m benchmarks.bench_parser [--repeat 20]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from car_webscraping import parse_card, parse_cards
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "toyota_vehicles.html")
+
+
+def parse_full_tree(html, parser):
+    """The original approach: build the whole document, then search it."""
+    soup = BeautifulSoup(html, parser)
+    return [car for car in map(parse_card, soup.find_all("div", class_="vehicle-card")) if car]
+
+
+def available_backends():
+    backends = [
+        ("html.parser, full tree", lambda html: parse_full_tree(html, "html.parser")),
+        ("html.parser, strainer", lambda html: list(parse_cards(html, parser="html.parser"))),
+    ]
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        print("lxml not installed; skipping lxml backends")
+        return backends
+    backends += [
+        ("lxml, full tree", lambda html: parse_full_tree(html, "lxml")),
+        ("lxml, strainer", lambda html: list(parse_cards(html, parser="lxml"))),
+    ]
+    return backends
+
+
+def measure(parse, html, repeat):
+    cars = parse(html)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(html)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    parse(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"cars": len(cars), "ms_per_page": elapsed * 1000, "peak_kib": peak / 1024}
+
+
+def run(repeat=20, fixture=FIXTURE_PATH):
+    with open(fixture, encoding="utf-8") as f:
+        html = f.read()
+    return {name: measure(parse, html, repeat) for name, parse in available_backends()}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--fixture", default=FIXTURE_PATH)
+    args = arg_parser.parse_args()
+
+    results = run(args.repeat, args.fixture)
+    print(f"{'backend':<24}{'cars':>6}{'ms/page':>10}{'peak KiB':>10}")
+    for name, r in results.items():
+        print(f"{name:<24}{r['cars']:>6}{r['ms_per_page']:>10.2f}{r['peak_kib']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Import-time / cold-start guard for the web worker.
+
+Spawns fresh interpreters that import app and build the Flask app, with
+socket connects disabled, so any network I/O at import time fails loudly.
+
+    python -m benchmarks.bench_startup [--runs 5] [--max-seconds 3.0]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+PROBE = """
+import socket, time
+def _no_network(*args, **kwargs):
+    raise RuntimeError("network I/O during import/app creation")
+socket.socket.connect = _no_network
+socket.create_connection = _no_network
+start = time.perf_counter()
+import app
+app.create_app(warm_up=False)
+print(time.perf_counter() - start)
+"""
+
+
+def cold_start_seconds():
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"cold start failed:\n{result.stderr}")
+    return float(result.stdout.strip().splitlines()[-1]), wall
+
+
+def run(runs=5):
+    samples = [cold_start_seconds() for _ in range(runs)]
+    imports = [s[0] for s in samples]
+    walls = [s[1] for s in samples]
+    return {
+        "runs": runs,
+        "import_median_s": statistics.median(imports),
+        "import_max_s": max(imports),
+        "process_median_s": statistics.median(walls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=3.0,
+                        help="fail if the median import + create_app time exceeds this")
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    print(f"import + create_app: median {results['import_median_s']:.3f}s, "
+          f"max {results['import_max_s']:.3f}s; process median {results['process_median_s']:.3f}s")
+    if results["import_median_s"] > args.max_seconds:
+        print(f"FAIL: cold start exceeds {args.max_seconds:.1f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Offline stand-ins for the services the tools talk to.
+
+FakeFirestore implements the slice of the firebase_admin Firestore API the
+catalog, financial cache and scraper use (collection/document refs, get,
+set, stream, batched set/update, on_snapshot). StubHTTPServer answers the
+Geocoding and Places Nearby Search endpoints (point MAPS_API_BASE at it)
+and serves saved fixture pages.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _Watch:
+    def unsubscribe(self):
+        pass
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data, update_time):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+        self.update_time = update_time
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return FakeCollection(self._db, f"{self.path}/{name}")
+
+    def get(self):
+        self._db.round_trip()
+        data, update_time = self._db.read(self.path)
+        return FakeSnapshot(self.id, data, update_time)
+
+    def set(self, data):
+        self._db.round_trip()
+        self._db.write({self.path: data})
+
+    def on_snapshot(self, callback):
+        # Listeners are accepted but never fire; benchmarks don't mutate watched docs.
+        return _Watch()
+
+
+class FakeCollection:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+
+    def document(self, doc_id):
+        return FakeDocument(self._db, f"{self.path}/{doc_id}")
+
+    def stream(self):
+        self._db.round_trip()
+        for doc_id, data, update_time in self._db.children(self.path):
+            yield FakeSnapshot(doc_id, data, update_time)
+
+    def on_snapshot(self, callback):
+        return _Watch()
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = {}
+
+    def set(self, doc_ref, data):
+        self._writes[doc_ref.path] = data
+
+    def update(self, doc_ref, fields):
+        data, _ = self._db.read(doc_ref.path)
+        if data is None:
+            raise KeyError(f"No document to update: {doc_ref.path}")
+        self._writes[doc_ref.path] = dict(self._writes.get(doc_ref.path, data), **fields)
+
+    def commit(self):
+        if len(self._writes) > 500:
+            raise ValueError("maximum 500 writes allowed per request")
+        self._db.round_trip()
+        self._db.write(self._writes)
+
+
+class FakeFirestore:
+    """
+    In-memory Firestore client. latency adds a fixed sleep per RPC (get,
+    stream, set, batch commit) to model the network round trip.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.rpcs = 0
+        self._lock = threading.Lock()
+        self._docs = {}  # path -> (data, update_time)
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def round_trip(self):
+        with self._lock:
+            self.rpcs += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def read(self, path):
+        with self._lock:
+            return self._docs.get(path, (None, None))
+
+    def write(self, writes):
+        update_time = datetime.now(timezone.utc)
+        with self._lock:
+            for path, data in writes.items():
+                self._docs[path] = (dict(data), update_time)
+
+    def children(self, collection_path):
+        prefix = collection_path + "/"
+        with self._lock:
+            items = [(path, entry) for path, entry in self._docs.items() if path.startswith(prefix)]
+        return [
+            (path[len(prefix):], data, update_time)
+            for path, (data, update_time) in sorted(items)
+            if "/" not in path[len(prefix):]
+        ]
+
+
+def _stable_random(*parts):
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def fake_geocode(address):
+    """Deterministic continental-US coordinate for an address."""
+    rng = _stable_random("geocode", address.strip().lower())
+    return {"lat": round(rng.uniform(30.0, 45.0), 6), "lng": round(rng.uniform(-120.0, -75.0), 6)}
+
+
+def fake_places(lat, lng, count=20):
+    """Deterministic Nearby Search results scattered within ~40 km of (lat, lng)."""
+    rng = _stable_random("places", round(lat, 4), round(lng, 4))
+    results = []
+    for i in range(count):
+        place_lat = lat + rng.uniform(-0.35, 0.35)
+        place_lng = lng + rng.uniform(-0.35, 0.35)
+        place_id = hashlib.sha1(f"{place_lat:.5f},{place_lng:.5f}".encode("utf-8")).hexdigest()[:27]
+        results.append({
+            "name": f"Toyota of Benchmark {i + 1}",
+            "vicinity": f"{100 + i} Main St",
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "place_id": place_id,
+            "geometry": {"location": {"lat": round(place_lat, 6), "lng": round(place_lng, 6)}}
+        })
+    return results
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.server.hits[url.path] = self.server.hits.get(url.path, 0) + 1
+
+        if url.path.endswith("/geocode/json"):
+            address = query.get("address", "")
+            body = {"status": "OK", "results": [{"geometry": {"location": fake_geocode(address)}}]}
+            return self._send_json(body)
+        if url.path.endswith("/place/nearbysearch/json"):
+            lat, lng = (float(v) for v in query.get("location", "0,0").split(","))
+            return self._send_json({"status": "OK", "results": fake_places(lat, lng)})
+        if url.path in self.server.pages:
+            return self._send(200, "text/html; charset=utf-8", self.server.pages[url.path])
+        self._send(404, "text/plain", b"not found")
+
+    def _send_json(self, body):
+        self._send(200, "application/json", json.dumps(body).encode("utf-8"))
+
+    def _send(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHTTPServer:
+    """
+    Local HTTP server on an ephemeral port. Maps endpoints live under
+    /maps/api (use maps_base as MAPS_API_BASE); extra pages are served
+    verbatim from the pages dict ({path: bytes}).
+    """
+
+    def __init__(self, pages=None):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.pages = dict(pages or {})
+        self._server.hits = {}
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def maps_base(self):
+        return f"{self.base_url}/maps/api"
+
+    @property
+    def hits(self):
+        return dict(self._server.hits)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
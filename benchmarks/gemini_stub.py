@@ -0,0 +1,276 @@
+"""
+Record/replay stand-in for the Gemini GenerativeModel used by chat.py.
+
+A cassette is JSON of the form
+
+    {"conversations": [{"id": "...", "turns": [
+        {"user": "user message",
+         "steps": [{"function_calls": [{"name": "find_cars", "args": {...}}],
+                    "latency_ms": 1800, "usage": {"prompt": 1400, "response": 22}},
+                   {"text": "Here are three hybrid SUVs...", "latency_ms": 2600,
+                    "usage": {"prompt": 2100, "response": 180}}]}]}]}
+
+ReplayModel answers each user message with its recorded steps in order:
+the first step replies to the message itself, each later step replies to
+the tool results chat.py sends back. Responses are real genai.protos
+Content objects (function_call parts included), delivered after the
+recorded latency. RecordingModel wraps a real model and writes cassettes.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from types import SimpleNamespace
+
+import google.generativeai as genai
+from google.protobuf import json_format
+
+DEFAULT_LATENCY_MS = 1500
+TTFT_FRACTION = 0.35  # share of a streamed step's latency spent before the first chunk
+WORDS_PER_CHUNK = 8
+
+
+def _normalize(text):
+    return " ".join(str(text).lower().split())
+
+
+def _user_content(message):
+    if isinstance(message, str):
+        return genai.protos.Content(role="user", parts=[genai.protos.Part(text=message)])
+    if not message.role:
+        message.role = "user"
+    return message
+
+
+def _model_content(step):
+    parts = [
+        genai.protos.Part(function_call=genai.protos.FunctionCall(name=call["name"], args=call.get("args", {})))
+        for call in step.get("function_calls", [])
+    ]
+    if step.get("text"):
+        parts.append(genai.protos.Part(text=step["text"]))
+    return genai.protos.Content(role="model", parts=parts)
+
+
+class StubResponse:
+    """The slice of GenerateContentResponse chat.py reads."""
+
+    def __init__(self, content, usage=None):
+        self.candidates = [SimpleNamespace(content=content)]
+        self.usage_metadata = None
+        if usage is not None:
+            self.usage_metadata = SimpleNamespace(
+                prompt_token_count=usage.get("prompt", 0),
+                candidates_token_count=usage.get("response", 0)
+            )
+
+    @property
+    def text(self):
+        texts = [part.text for part in self.candidates[0].content.parts if part.text]
+        if not texts:
+            raise ValueError("response has no text part (function call only)")
+        return "".join(texts)
+
+
+class ReplayChatSession:
+    def __init__(self, model, history):
+        self._model = model
+        self.history = list(history or [])
+        self._pending = deque()
+
+    def _next_step(self, message):
+        if isinstance(message, str):
+            self._pending = deque(self._model.steps_for(message))
+        self.history.append(_user_content(message))
+        if self._pending:
+            return self._pending.popleft()
+        return self._model.miss(message)
+
+    async def send_message_async(self, message):
+        step = self._next_step(message)
+        await asyncio.sleep(self._model.delay(step))
+        content = _model_content(step)
+        self.history.append(content)
+        return StubResponse(content, step.get("usage"))
+
+    def send_message(self, message, stream=False):
+        step = self._next_step(message)
+        if stream:
+            return self._stream(step)
+        time.sleep(self._model.delay(step))
+        content = _model_content(step)
+        self.history.append(content)
+        return StubResponse(content, step.get("usage"))
+
+    def _stream(self, step):
+        delay = self._model.delay(step)
+        time.sleep(delay * TTFT_FRACTION)
+        content = _model_content(step)
+        if step.get("function_calls"):
+            # Gemini delivers function calls whole, in a single chunk
+            time.sleep(delay * (1 - TTFT_FRACTION))
+            self.history.append(content)
+            yield StubResponse(content, step.get("usage"))
+            return
+        words = step.get("text", "").split(" ")
+        chunks = [" ".join(words[i:i + WORDS_PER_CHUNK]) for i in range(0, len(words), WORDS_PER_CHUNK)]
+        gap = delay * (1 - TTFT_FRACTION) / max(len(chunks), 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(gap)
+            text = chunk if i == len(chunks) - 1 else chunk + " "
+            last = i == len(chunks) - 1
+            yield StubResponse(
+                genai.protos.Content(role="model", parts=[genai.protos.Part(text=text)]),
+                step.get("usage") if last else None
+            )
+        self.history.append(content)
+
+
+class ReplayModel:
+    """
+    Drop-in for genai.GenerativeModel backed by a cassette. Latencies are
+    multiplied by latency_scale and jittered by +/- jitter. Unrecorded
+    messages get a short canned text reply and are counted as misses.
+    """
+
+    def __init__(self, cassette, latency_scale=1.0, jitter=0.15, seed=None):
+        if isinstance(cassette, str):
+            with open(cassette, encoding="utf-8") as f:
+                cassette = json.load(f)
+        self.conversations = cassette["conversations"]
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._steps = {}
+        for conversation in self.conversations:
+            for turn in conversation["turns"]:
+                self._steps.setdefault(_normalize(turn["user"]), turn["steps"])
+        self.stats = {"turns": 0, "steps": 0, "misses": 0}
+
+    def start_chat(self, history=None):
+        return ReplayChatSession(self, history)
+
+    def steps_for(self, message):
+        steps = self._steps.get(_normalize(message), [])
+        with self._lock:
+            self.stats["turns"] += 1
+        return steps
+
+    def miss(self, message):
+        with self._lock:
+            self.stats["misses"] += 1
+        return {"text": "Sorry, I don't have a recorded answer for that.",
+                "usage": {"prompt": 800, "response": 12}}
+
+    def delay(self, step):
+        with self._lock:
+            self.stats["steps"] += 1
+            jitter = self._random.uniform(1 - self.jitter, 1 + self.jitter)
+        return step.get("latency_ms", DEFAULT_LATENCY_MS) / 1000 * self.latency_scale * jitter
+
+
+def _step_from_response(response, elapsed):
+    parts = response.candidates[0].content.parts
+    step = {}
+    calls = [
+        {"name": part.function_call.name,
+         "args": json_format.MessageToDict(genai.protos.FunctionCall.pb(part.function_call)).get("args", {})}
+        for part in parts if part.function_call
+    ]
+    if calls:
+        step["function_calls"] = calls
+    text = "".join(part.text for part in parts if part.text)
+    if text:
+        step["text"] = text
+    step["latency_ms"] = round(elapsed * 1000)
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata:
+        step["usage"] = {"prompt": metadata.prompt_token_count, "response": metadata.candidates_token_count}
+    return step
+
+
+class _Recorder:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conversations = OrderedDict()  # first user message -> conversation
+
+    def start_turn(self, key, message):
+        turn = {"user": message, "steps": []}
+        with self._lock:
+            conversation = self._conversations.setdefault(
+                key, {"id": f"recorded-{len(self._conversations) + 1}", "turns": []}
+            )
+            conversation["turns"].append(turn)
+        return turn
+
+    def save(self):
+        with self._lock:
+            data = {"conversations": list(self._conversations.values())}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+
+class RecordingChatSession:
+    def __init__(self, inner, recorder):
+        self._inner = inner
+        self._recorder = recorder
+        self._key = next(
+            (part.text for content in inner.history if content.role == "user"
+             for part in content.parts if part.text), None
+        )
+        self._turn = None
+
+    @property
+    def history(self):
+        return self._inner.history
+
+    def _begin(self, message):
+        if isinstance(message, str):
+            self._key = self._key or message
+            self._turn = self._recorder.start_turn(self._key, message)
+
+    async def send_message_async(self, message):
+        self._begin(message)
+        start = time.perf_counter()
+        response = await self._inner.send_message_async(message)
+        self._turn["steps"].append(_step_from_response(response, time.perf_counter() - start))
+        return response
+
+    def send_message(self, message, stream=False):
+        self._begin(message)
+        if stream:
+            return self._stream(message)
+        start = time.perf_counter()
+        response = self._inner.send_message(message)
+        self._turn["steps"].append(_step_from_response(response, time.perf_counter() - start))
+        return response
+
+    def _stream(self, message):
+        start = time.perf_counter()
+        chunks = []
+        for chunk in self._inner.send_message(message, stream=True):
+            chunks.append(chunk)
+            yield chunk
+        parts = [part for chunk in chunks for part in chunk.candidates[0].content.parts]
+        merged = StubResponse(genai.protos.Content(role="model", parts=parts))
+        merged.usage_metadata = getattr(chunks[-1], "usage_metadata", None) if chunks else None
+        self._turn["steps"].append(_step_from_response(merged, time.perf_counter() - start))
+
+
+class RecordingModel:
+    """Wraps a real GenerativeModel and records every exchange into a cassette."""
+
+    def __init__(self, model, path):
+        self._model = model
+        self.recorder = _Recorder(path)
+
+    def start_chat(self, history=None):
+        return RecordingChatSession(self._model.start_chat(history=history), self.recorder)
+
+    def save(self):
+        self.recorder.save()
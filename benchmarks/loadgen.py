@@ -0,0 +1,261 @@
+"""
+End-to-end load generator for the /api/chat Blueprint.
+
+Serves the real Flask app on a local threaded server with Gemini replaced by
+the record/replay stub (benchmarks.gemini_stub), Firestore by the in-memory
+fake and Google Maps by the stub HTTP server, then replays the cassette's
+multi-turn conversations from concurrent virtual users. Reports p50/p95/p99
+turn latency (and time to first token when streaming) plus throughput.
+
+    python -m benchmarks.loadgen [--concurrency 16] [--conversations 64]
+                                 [--stream] [--latency-scale 1.0]
+    python -m benchmarks.loadgen --record new_cassette.json   # needs GOOGLE_API_KEY
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.fakes import FakeFirestore, StubHTTPServer
+from benchmarks.suite import RESULTS_DIR, seed_firestore, synthetic_cars
+
+CASSETTE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "chat_conversations.json")
+
+
+def percentiles(samples):
+    """Nearest-rank p50/p95/p99 plus mean and max, in the samples' unit."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 2)
+
+    return {"p50": rank(50), "p95": rank(95), "p99": rank(99),
+            "mean": round(sum(ordered) / len(ordered), 2), "max": round(ordered[-1], 2), "count": len(ordered)}
+
+
+def prepare_app(args, server, cassette):
+    """Points every external dependency at a local stand-in and returns the Flask app."""
+    os.environ["MAPS_API_BASE"] = server.maps_base
+    os.environ.setdefault("MAP_API", "load-key")
+    os.environ.setdefault("SESSION_STORE", "memory")
+
+    import catalog
+    import chat
+    import dealer_index
+    import firebase_tools
+    import geo_cache
+    from app import create_app
+    from benchmarks.gemini_stub import RecordingModel, ReplayModel
+
+    db = FakeFirestore(latency=args.rpc_latency_ms / 1000)
+    seed_firestore(db, synthetic_cars(args.cars))
+    firebase_tools.db_client = db
+    catalog._catalog = catalog.CarCatalog()
+    catalog._catalog.load(db)
+    geo_cache._geo_cache = geo_cache.GeoCache(path=":memory:")
+    dealer_index._dealer_index = dealer_index.DealershipIndex(
+        path=os.path.join(tempfile.mkdtemp(prefix="loadgen-"), "dealerships.json")
+    )
+
+    if args.record:
+        chat._model = RecordingModel(chat.get_model(), args.record)
+    else:
+        chat._model = ReplayModel(cassette, latency_scale=args.latency_scale, seed=args.seed)
+    return create_app(warm_up=False), chat
+
+
+class LocalServer:
+    """Runs a WSGI app on a threaded werkzeug server on an ephemeral port."""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self._server = make_server("127.0.0.1", 0, app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+
+
+def send_turn(session, url, user_id, message, stream, timeout):
+    """Posts one chat turn; returns (latency_s, ttft_s or None, error or None)."""
+    payload = {"user_id": user_id, "message": message, "stream": stream}
+    start = time.perf_counter()
+    try:
+        response = session.post(f"{url}/api/chat", json=payload, timeout=timeout, stream=stream)
+        if response.status_code != 200:
+            return time.perf_counter() - start, None, f"HTTP {response.status_code}"
+        if not stream:
+            body = response.json()
+            return time.perf_counter() - start, None, body.get("error") if "reply" not in body else None
+
+        ttft, error = None, None
+        for line in response.iter_lines(decode_unicode=True):
+            if line == "event: token" and ttft is None:
+                ttft = time.perf_counter() - start
+            elif line == "event: error":
+                error = "stream error event"
+        return time.perf_counter() - start, ttft, error
+    except requests.RequestException as e:
+        return time.perf_counter() - start, None, type(e).__name__
+
+
+def run_load(url, conversations, args):
+    """Replays conversations from args.concurrency virtual users; returns raw samples."""
+    ids = range(args.conversations) if args.conversations else itertools.count()
+    jobs = zip(ids, itertools.cycle(conversations))
+    jobs_lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    samples = []
+    samples_lock = threading.Lock()
+
+    def virtual_user():
+        session = requests.Session()
+        while deadline is None or time.perf_counter() < deadline:
+            with jobs_lock:
+                job = next(jobs, None)
+            if job is None:
+                return
+            i, conversation = job
+            user_id = f"load-{i}"
+            for turn in conversation["turns"]:
+                latency, ttft, error = send_turn(session, url, user_id, turn["user"], args.stream, args.timeout)
+                kind = "tool" if any(step.get("function_calls") for step in turn["steps"]) else "text"
+                with samples_lock:
+                    samples.append({"conversation": conversation["id"], "kind": kind,
+                                    "latency": latency, "ttft": ttft, "error": error})
+                if args.think_ms:
+                    time.sleep(args.think_ms / 1000)
+
+    workers = [threading.Thread(target=virtual_user, daemon=True) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return samples, time.perf_counter() - start
+
+
+def report(samples, elapsed, args, chat):
+    ok = [s for s in samples if s["error"] is None]
+    errors = {}
+    for s in samples:
+        if s["error"] is not None:
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+    result = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "concurrency": args.concurrency,
+            "conversations": args.conversations,
+            "stream": args.stream,
+            "latency_scale": args.latency_scale,
+            "think_ms": args.think_ms,
+            "catalog_cars": args.cars,
+        },
+        "turns": len(samples),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": percentiles([s["latency"] * 1000 for s in ok]),
+        "latency_ms_by_kind": {
+            kind: percentiles([s["latency"] * 1000 for s in ok if s["kind"] == kind])
+            for kind in ("text", "tool")
+        },
+        "tool_dispatcher": chat.tool_dispatcher.stats(),
+    }
+    if args.stream:
+        result["ttft_ms"] = percentiles([s["ttft"] * 1000 for s in ok if s["ttft"] is not None])
+    if hasattr(chat._model, "stats"):
+        result["gemini_stub"] = dict(chat._model.stats)
+    return result
+
+
+def print_report(result):
+    latency = result["latency_ms"]
+    print(f"{result['turns']} turns in {result['elapsed_s']:.1f}s at concurrency "
+          f"{result['meta']['concurrency']}: {result['throughput_turns_per_s']:.2f} turns/s, "
+          f"{sum(result['errors'].values())} errors")
+    if latency:
+        print(f"turn latency ms  p50 {latency['p50']:.0f}  p95 {latency['p95']:.0f}  p99 {latency['p99']:.0f}  "
+              f"max {latency['max']:.0f}")
+    for kind, stats in result["latency_ms_by_kind"].items():
+        if stats:
+            print(f"  {kind + ' turns':<12} p50 {stats['p50']:.0f}  p95 {stats['p95']:.0f}  p99 {stats['p99']:.0f}")
+    if result.get("ttft_ms"):
+        ttft = result["ttft_ms"]
+        print(f"time to first token ms  p50 {ttft['p50']:.0f}  p95 {ttft['p95']:.0f}  p99 {ttft['p99']:.0f}")
+    if result["errors"]:
+        print(f"errors: {result['errors']}")
+    if result.get("gemini_stub", {}).get("misses"):
+        print(f"WARNING: {result['gemini_stub']['misses']} user messages had no recording")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default=CASSETTE_PATH, help="recorded conversations to replay")
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users")
+    parser.add_argument("--conversations", type=int, default=None,
+                        help="conversations to replay in total (default 4 per virtual user, unlimited with --duration)")
+    parser.add_argument("--duration", type=float, default=None, help="stop starting conversations after N seconds")
+    parser.add_argument("--stream", action="store_true", help="use the SSE streaming endpoint")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="multiplier on recorded Gemini latencies (0.1 for quick runs)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a user's turns")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--cars", type=int, default=2000, help="catalog size in the fake Firestore")
+    parser.add_argument("--rpc-latency-ms", type=float, default=0.0, help="simulated Firestore round trip")
+    parser.add_argument("--seed", type=int, default=1, help="latency jitter seed")
+    parser.add_argument("--record", metavar="PATH",
+                        help="call the real Gemini API once per conversation and write a new cassette")
+    parser.add_argument("--output", help="results file (default benchmarks/results/loadgen-<timestamp>.json)")
+    args = parser.parse_args()
+
+    with open(args.cassette, encoding="utf-8") as f:
+        cassette = json.load(f)
+    conversations = cassette["conversations"]
+    if args.record:
+        if not os.getenv("GOOGLE_API_KEY"):
+            raise SystemExit("--record calls the real Gemini API and needs GOOGLE_API_KEY")
+        args.concurrency, args.conversations, args.duration = 1, len(conversations), None
+    if args.conversations is None and args.duration is None:
+        args.conversations = args.concurrency * 4
+
+    with StubHTTPServer() as maps_server:
+        app, chat = prepare_app(args, maps_server, cassette)
+        with LocalServer(app) as server:
+            print(f"replaying {args.conversations} conversations against {server.url} "
+                  f"with {args.concurrency} virtual users...", file=sys.stderr)
+            samples, elapsed = run_load(server.url, conversations, args)
+
+    if args.record:
+        chat._model.save()
+        print(f"recorded {len(conversations)} conversations to {args.record}")
+        return
+
+    result = report(samples, elapsed, args, chat)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("loadgen-%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print_report(result)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Offline micro-benchmarks for the tool and scraper hot paths.
+
+Runs find_cars (Firestore-loaded and snapshot catalogs), getInterestRate /
+financialPlan / financialQuotes, card parsing of the saved Toyota fixture,
+save_car_data / sync_car_data ingest and find_toyota_dealerships against a
+fake Firestore (or the emulator) and a local stub HTTP server standing in
+for Google Maps. Results are written as
+JSON; --compare fails the run when a benchmark's median regressed.
+
+    python -m benchmarks.suite [--only find_cars,ingest] [--repeat 30]
+                               [--compare benchmarks/results/baseline.json]
+
+Timings only compare on the machine that produced them, so no baseline is
+committed (benchmarks/results/ is ignored). Record one from the base commit
+before benchmarking a change:
+
+    git stash && python -m benchmarks.suite --output benchmarks/results/baseline.json
+    git stash pop && python -m benchmarks.suite --compare benchmarks/results/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import FakeFirestore, StubHTTPServer, fake_places
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "toyota_vehicles.html")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BENCH_USER = "bench-user"
+GROUPS = ("find_cars", "financial", "parsing", "ingest", "dealerships")
+
+CAR_TYPES = ("Sedan", "SUV", "Truck", "Minivan", "Hatchback", "Crossover")
+POWERTRAINS = ("Gas", "Hybrid", "Plug-in Hybrid", "Electric", "Fuel Cell")
+MODELS = ("Camry", "Corolla", "RAV4", "Highlander", "Tacoma", "Tundra", "Sienna",
+          "Prius", "bZ4X", "Grand Highlander", "Crown", "Mirai", "Sequoia", "4Runner")
+
+
+def synthetic_cars(count, seed=7):
+    """Deterministic scraped-car dicts shaped like parse_card output."""
+    rng = random.Random(seed)
+    cars = []
+    for i in range(count):
+        powertrain = rng.choice(POWERTRAINS)
+        mileage = f"{200 + i % 120} mi est. range" if powertrain == "Electric" else f"{rng.randint(20, 57)} est. mpg"
+        car_type = rng.sample(CAR_TYPES, rng.choice((1, 1, 2)))
+        cars.append({
+            "name": f"{rng.choice(MODELS)} Trim {i}",
+            "price": rng.randrange(21000, 80000, 5),
+            "make_year": str(rng.choice((2023, 2024, 2025, 2026))),
+            "powertrain": powertrain,
+            "car_type": car_type if len(car_type) > 1 else car_type[0],
+            "mileages_or_ranges": mileage,
+            "car_image": f"https://example.com/img/{i}.png"
+        })
+    return cars
+
+
+def timed(fn, repeat, setup=None, warmup=1):
+    """Median / p95 / min wall time of fn over repeat runs; setup runs untimed before each."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "median_ms": round(samples[len(samples) // 2], 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4)
+    }
+
+
+def _tool_fn(tool):
+    # langchain's @tool wraps the function in a StructuredTool
+    return getattr(tool, "func", tool)
+
+
+def seed_firestore(db, cars, credit_score=720):
+    from car_webscraping import car_doc_id
+    for start in range(0, len(cars), 500):
+        batch = db.batch()
+        for car in cars[start:start + 500]:
+            batch.set(db.collection("cars").document(car_doc_id(car)), car)
+        batch.commit()
+    db.collection("users").document(BENCH_USER).collection("financial").document("data").set(
+        {"annualIncome": 95000, "debtToIncomeRatio": 0.21, "creditScore": credit_score}
+    )
+
+
+def bench_find_cars(db, args):
+    import catalog
+    import firebase_tools
+
+    results = {"catalog_load": timed(lambda: catalog.CarCatalog().load(db), max(3, args.repeat // 10))}
+    catalog._catalog = catalog.CarCatalog()
+    catalog._catalog.load(db)
+    firebase_tools.db_client = db
+    find_cars = _tool_fn(firebase_tools.find_cars)
+    page_one = find_cars(car_type="SUV", max_price=60000)
+    if "error" in page_one:
+        raise RuntimeError(f"find_cars failed: {page_one['error']}")
+
+    scenarios = {
+        "no_filters": {},
+        "car_type": {"car_type": "SUV"},
+        "max_price": {"max_price": 35000},
+        "car_type+max_price": {"car_type": "SUV", "max_price": 60000},
+        "all_filters": {"car_type": "Sedan", "max_price": 45000, "make_year": "2025", "powertrain": "Hybrid"},
+        "price_desc_limit_50": {"max_price": 70000, "sort": "price_desc", "limit": 50},
+        "select_name_price": {"powertrain": "Electric", "select": ["name", "price"]},
+        "second_page": {"car_type": "SUV", "max_price": 60000, "cursor": page_one["next_cursor"]},
+        "min_range": {"min_range": 250},
+    }
+    for name, kwargs in scenarios.items():
+        results[f"find_cars[{name}]"] = timed(lambda: find_cars(**kwargs), args.repeat)
+
+    # Same queries against the memory-mapped columnar snapshot
+    from catalog_snapshot import export_snapshot
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-snapshot-"), "catalog_snapshot")
+    with contextlib.redirect_stdout(io.StringIO()):
+        export_snapshot(db, path)
+
+        def load_snapshot():
+            catalog.SnapshotCatalog(path).load()
+
+        results["catalog_load[snapshot]"] = timed(load_snapshot, max(3, args.repeat // 10))
+        catalog._catalog = catalog.SnapshotCatalog(path)
+        catalog._catalog.load()
+    for name, kwargs in scenarios.items():
+        results[f"find_cars[{name}, snapshot]"] = timed(lambda: find_cars(**kwargs), args.repeat)
+    catalog._catalog = None
+    return results
+
+
+def bench_financial(db, args):
+    import firebase_tools
+    from financial_cache import get_financial_cache
+
+    firebase_tools.db_client = db
+    get_financial_cache().evict(BENCH_USER)
+    scores = list(range(300, 851))
+
+    def rate_each_score():
+        for score in scores:
+            firebase_tools.getInterestRate(score)
+
+    prices = list(range(25000, 75000, 5000))
+    downs = [0, 2000, 5000, 8000, 10000]
+    return {
+        "getInterestRate[551 scores]": timed(rate_each_score, args.repeat),
+        "financialPlan[cash]": timed(lambda: firebase_tools.financialPlan("cash", BENCH_USER, 32000), args.repeat),
+        "financialPlan[finance]": timed(
+            lambda: firebase_tools.financialPlan("finance", BENCH_USER, 32000, 4000, 60), args.repeat),
+        "financialPlan[lease]": timed(
+            lambda: firebase_tools.financialPlan("lease", BENCH_USER, 32000, 4000, 36), args.repeat),
+        "financialQuotes[10x5x4]": timed(
+            lambda: firebase_tools.financialQuotes("finance", BENCH_USER, prices, downs), args.repeat),
+        "financialQuotes[10x5x4x5 tiers]": timed(
+            lambda: firebase_tools.financialQuotes("finance", BENCH_USER, prices, downs,
+                                                   creditScores=[580, 620, 680, 720, 780]), args.repeat),
+    }
+
+
+def bench_parsing(server, args):
+    from car_webscraping import get_model_data, parse_cards
+
+    with open(FIXTURE_PATH, encoding="utf-8") as f:
+        html = f.read()
+    url = f"{server.base_url}/vehicles"
+    cars = get_model_data(url)
+    if not cars:
+        raise RuntimeError("fixture page produced no cars")
+    return {
+        f"parse_cards[fixture, {len(cars)} cars]": timed(lambda: list(parse_cards(html)), args.repeat),
+        "get_model_data[stub http]": timed(lambda: get_model_data(url), args.repeat),
+    }
+
+
+def bench_ingest(args):
+    from car_webscraping import save_car_data, sync_car_data
+
+    cars = synthetic_cars(args.ingest_cars, seed=11)
+    summary = {}
+
+    def ingest():
+        db = FakeFirestore(latency=args.rpc_latency_ms / 1000)
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary.update(save_car_data(cars, db=db))
+        summary["rpcs"] = db.rpcs
+
+    result = timed(ingest, max(3, args.repeat // 10))
+    result.update(docs=len(cars), batch_rpcs=summary["rpcs"], failed=len(summary["failed"]))
+    results = {f"save_car_data[{len(cars)} docs]": result}
+
+    # Nightly refresh: ~2% of cars changed, ~1% dropped from the scrape
+    db = FakeFirestore(latency=args.rpc_latency_ms / 1000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        save_car_data(cars, db=db)
+    refreshed = [dict(car, price=car["price"] + 500) if i % 50 == 0 else car
+                 for i, car in enumerate(cars) if i % 100 != 1]
+
+    def sync():
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary.update(sync_car_data(refreshed, db=db, changelog_path=None))
+
+    sync()
+    first = {k: summary[k] for k in ("added", "changed", "removed", "writes")}
+    result = timed(sync, max(3, args.repeat // 10), warmup=0)
+    # The first sync writes the delta; the timed runs find nothing left to write
+    result.update(docs=len(refreshed), first_sync=first, writes=summary["writes"])
+    results[f"sync_car_data[{len(cars)} docs, unchanged]"] = result
+    return results
+
+
+def bench_dealerships(server, args):
+    import dealer_index
+    import firebase_tools
+    import geo_cache
+
+    workdir = tempfile.mkdtemp(prefix="bench-dealers-")
+    index_path = os.path.join(workdir, "dealerships.json")
+    find_dealerships = _tool_fn(firebase_tools.find_toyota_dealerships)
+    address = "1 Benchmark Way, Plano, TX"
+
+    def reset():
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(index_path)
+        geo_cache._geo_cache = geo_cache.GeoCache(path=":memory:")
+        dealer_index._dealer_index = dealer_index.DealershipIndex(path=index_path)
+
+    def lookup():
+        result = find_dealerships(address, radius=20000)
+        if "error" in result:
+            raise RuntimeError(f"find_toyota_dealerships failed: {result['error']}")
+
+    results = {"find_toyota_dealerships[cold]": timed(lookup, max(3, args.repeat // 5), setup=reset)}
+    reset()
+    lookup()
+    results["find_toyota_dealerships[warm]"] = timed(lookup, args.repeat)
+
+    # Larger local dataset: many seeded areas around the same region
+    reset()
+    index = dealer_index.get_dealer_index()
+    rng = random.Random(3)
+    for _ in range(args.dealer_areas):
+        lat, lng = rng.uniform(32.0, 34.0), rng.uniform(-98.0, -96.0)
+        index.add_search(lat, lng, dealer_index.DEALER_SEED_RADIUS, _dealerships(lat, lng))
+    lat, lng = 33.0, -97.0
+    results[f"query_radius[{len(index)} dealers]"] = timed(lambda: index.query_radius(lat, lng, 20000), args.repeat)
+    results[f"nearest[{len(index)} dealers]"] = timed(lambda: index.nearest(lat, lng, k=5), args.repeat)
+    return results
+
+
+def _dealerships(lat, lng):
+    """Stub Places results in the shape seed_dealerships stores."""
+    return [
+        {"name": p["name"], "address": p["vicinity"], "rating": p["rating"],
+         "place_id": p["place_id"], "location": p["geometry"]["location"]}
+        for p in fake_places(lat, lng)
+    ]
+
+
+def emulator_client():
+    """Firestore client for the local emulator (FIRESTORE_EMULATOR_HOST must be set)."""
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        raise SystemExit("--emulator needs FIRESTORE_EMULATOR_HOST (e.g. localhost:8080)")
+    import firebase_admin
+    from firebase_admin import firestore
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(options={"projectId": os.getenv("FIREBASE_PROJECT_ID", "demo-bench")})
+    return firestore.client()
+
+
+def run(args):
+    with open(FIXTURE_PATH, "rb") as f:
+        pages = {"/vehicles": f.read()}
+    groups = args.only.split(",") if args.only else GROUPS
+    results = {}
+
+    with StubHTTPServer(pages) as server:
+        # Module-level config is read at import time, so set it before the first import
+        os.environ["MAPS_API_BASE"] = server.maps_base
+        os.environ.setdefault("MAP_API", "bench-key")
+        os.environ.setdefault("GEO_CACHE_PATH", ":memory:")
+        os.environ.setdefault("SESSION_STORE", "memory")
+
+        db = emulator_client() if args.emulator else FakeFirestore(latency=args.rpc_latency_ms / 1000)
+        if {"find_cars", "financial"} & set(groups):
+            seed_firestore(db, synthetic_cars(args.cars))
+
+        for group in groups:
+            print(f"running {group}...", file=sys.stderr)
+            if group == "find_cars":
+                results.update(bench_find_cars(db, args))
+            elif group == "financial":
+                results.update(bench_financial(db, args))
+            elif group == "parsing":
+                results.update(bench_parsing(server, args))
+            elif group == "ingest":
+                results.update(bench_ingest(args))
+            elif group == "dealerships":
+                results.update(bench_dealerships(server, args))
+            else:
+                raise SystemExit(f"unknown benchmark group {group!r}; choose from {', '.join(GROUPS)}")
+        stub_hits = server.hits
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "firestore": "emulator" if args.emulator else "fake",
+            "params": {"repeat": args.repeat, "cars": args.cars, "ingest_cars": args.ingest_cars,
+                       "rpc_latency_ms": args.rpc_latency_ms, "dealer_areas": args.dealer_areas},
+            "stub_http_hits": stub_hits,
+        },
+        "results": results
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, tolerance):
+    """Prints median deltas against a baseline run; returns the names that regressed."""
+    regressions = []
+    print(f"{'benchmark':<48}{'base ms':>10}{'now ms':>10}{'delta':>9}")
+    for name, now in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:<48}{'-':>10}{now['median_ms']:>10.3f}{'new':>9}")
+            continue
+        delta = now["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+        flag = ""
+        if delta > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<48}{base['median_ms']:>10.3f}{now['median_ms']:>10.3f}{delta:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help=f"comma-separated groups ({', '.join(GROUPS)})")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--cars", type=int, default=5000, help="catalog size for find_cars")
+    parser.add_argument("--ingest-cars", type=int, default=2000)
+    parser.add_argument("--rpc-latency-ms", type=float, default=0.0,
+                        help="simulated Firestore round trip per RPC (fake only)")
+    parser.add_argument("--dealer-areas", type=int, default=50,
+                        help="seeded Places areas for the query_radius/nearest benchmarks")
+    parser.add_argument("--emulator", action="store_true",
+                        help="use the Firestore emulator at FIRESTORE_EMULATOR_HOST instead of the fake")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed median slowdown before --compare fails (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    current = run(args)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        print(f"results written to {output}")
+        if regressions:
+            print(f"FAIL: {len(regressions)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        return
+
+    print(f"{'benchmark':<48}{'median ms':>11}{'p95 ms':>10}")
+    for name, r in current["results"].items():
+        print(f"{name:<48}{r['median_ms']:>11.3f}{r['p95_ms']:>10.3f}")
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# canonical.py
+import difflib
+import re
+
+FUZZY_THRESHOLD = 0.75
+MAX_SUGGESTIONS = 5
+
+# Free-form words the model uses -> the term stored values start with (after normalize_value).
+# Stored car_type values are Toyota's page categories ("cars", "suvs", "electrified", ...);
+# stored powertrains are the card labels ("Hybrid EV", "Battery EV", "Gasoline", ...).
+SYNONYMS = {
+    "car_type": {
+        "car": "car", "sedan": "car", "coupe": "car", "hatchback": "car", "compact": "car",
+        "passenger car": "car",
+        "suv": "suv", "sport utility": "suv", "sport utility vehicle": "suv", "4x4": "suv",
+        "crossover": "crossover", "cuv": "crossover", "crossover suv": "crossover",
+        "truck": "truck", "pickup": "truck", "pickup truck": "truck", "pick up": "truck",
+        "minivan": "minivan", "van": "minivan", "mpv": "minivan", "family van": "minivan",
+        "performance": "performance", "sport": "performance", "sports car": "performance",
+        "sporty": "performance", "gr": "performance",
+        "electrified": "electrified", "hybrid": "electrified", "electric": "electrified",
+        "ev": "electrified", "green": "electrified", "eco": "electrified",
+    },
+    "powertrain": {
+        "gasoline": "gasoline", "gas": "gasoline", "petrol": "gasoline", "ice": "gasoline",
+        "conventional": "gasoline", "combustion": "gasoline", "standard": "gasoline",
+        "hybrid": "hybrid ev", "hev": "hybrid ev", "hybrid electric": "hybrid ev",
+        "full hybrid": "hybrid ev", "self charging hybrid": "hybrid ev",
+        "plug in": "plug in hybrid ev", "plug in hybrid": "plug in hybrid ev", "phev": "plug in hybrid ev",
+        "plugin": "plug in hybrid ev", "plugin hybrid": "plug in hybrid ev",
+        "electric": "battery ev", "ev": "battery ev", "bev": "battery ev", "battery": "battery ev",
+        "battery electric": "battery ev", "all electric": "battery ev", "fully electric": "battery ev",
+        "fuel cell": "fuel cell ev", "hydrogen": "fuel cell ev", "fcev": "fuel cell ev",
+    },
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_YEAR = re.compile(r"(19|20)\d{2}")
+_MPG = re.compile(r"(\d+(?:\.\d+)?)(?:\s*/\s*(\d+(?:\.\d+)?))?\s*(?:est\.?\s*)?mpg", re.IGNORECASE)
+_RANGE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*mi\b(?!\s*/)[^/]*\brange", re.IGNORECASE)
+
+
+def _singular(token):
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def normalize_value(value) -> str:
+    """Lower-case, punctuation-free, singular form: "SUVs" -> "suv", "Plug-in Hybrid EV" -> "plug in hybrid ev"."""
+    return " ".join(_singular(token) for token in _NON_ALNUM.sub(" ", str(value).lower()).split())
+
+
+def canonical_year(value):
+    """2025, 2025.0, "2025" and "2025 model" all become "2025"; None if there is no year."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    match = _YEAR.search(str(value))
+    return match.group(0) if match else None
+
+
+def parse_efficiency(text) -> dict:
+    """
+    Numeric fields from a card's mileages_or_ranges label:
+    "41/38 est. mpg" -> mpg_city 41, mpg_highway 38; "252 mi est. range" and
+    "44 mi est. electric range" -> range_mi. Missing values are None.
+    """
+    result = {"mpg_city": None, "mpg_highway": None, "range_mi": None}
+    if not text:
+        return result
+    text = str(text)
+    mpg = _MPG.search(text)
+    if mpg:
+        result["mpg_city"] = float(mpg.group(1))
+        result["mpg_highway"] = float(mpg.group(2) or mpg.group(1))
+    electric = _RANGE.search(text)
+    if electric:
+        result["range_mi"] = float(electric.group(1).replace(",", ""))
+    return result
+
+
+_SYNONYMS = {
+    field: {normalize_value(alias): term for alias, term in aliases.items()}
+    for field, aliases in SYNONYMS.items()
+}
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Trigram postings over a small vocabulary; candidates are scored by trigram Dice and edit ratio."""
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+        self._grams = [_trigrams(term) for term in self.terms]
+        self._postings = {}
+        for i, grams in enumerate(self._grams):
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(i)
+
+    def search(self, text, limit=MAX_SUGGESTIONS):
+        """Returns [(score, term)] best first."""
+        grams = _trigrams(text)
+        candidates = set()
+        for gram in grams:
+            candidates |= self._postings.get(gram, set())
+        scored = []
+        for i in candidates:
+            dice = 2 * len(grams & self._grams[i]) / (len(grams) + len(self._grams[i]))
+            ratio = difflib.SequenceMatcher(None, text, self.terms[i]).ratio()
+            scored.append((round(max(dice, ratio), 3), self.terms[i]))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:limit]
+
+
+class ValueResolver:
+    """
+    Maps a free-form filter value to the stored values of one catalog field,
+    in one shot: exact (normalized) match, then the synonym table, then
+    stored values starting with the requested words, then fuzzy matching
+    over stored values and synonyms (catches typos like "hybird").
+    """
+
+    def __init__(self, field, stored_values):
+        self.field = field
+        self.synonyms = _SYNONYMS.get(field, {})
+        self._by_norm = {}
+        for value in stored_values:
+            self._by_norm.setdefault(normalize_value(value), []).append(value)
+        self._index = TrigramIndex(sorted(set(self._by_norm) | set(self.synonyms)))
+        self._memo = {}
+
+    def _starting_with(self, term):
+        return sorted(
+            value for norm, values in self._by_norm.items()
+            if norm == term or norm.startswith(term + " ")
+            for value in values
+        )
+
+    def _match(self, norm):
+        if norm in self._by_norm:
+            return sorted(self._by_norm[norm]), "exact"
+        if norm in self.synonyms:
+            matched = self._starting_with(self.synonyms[norm])
+            if matched:
+                return matched, "synonym"
+        matched = self._starting_with(norm)
+        if matched:
+            return matched, "prefix"
+        return None, None
+
+    def resolve(self, value) -> dict:
+        """{"requested", "matched": [stored values], "method"} plus "suggestions" when nothing matched."""
+        norm = normalize_value(value)
+        if norm not in self._memo:
+            matched, method = self._match(norm)
+            suggestions = None
+            if matched is None:
+                scored = self._index.search(norm)
+                for score, term in scored:
+                    if score < FUZZY_THRESHOLD:
+                        break
+                    matched, _ = self._match(term)
+                    if matched:
+                        method = "fuzzy"
+                        break
+                if matched is None:
+                    matched, method = [], "none"
+                    suggestions = sorted(v for values in self._by_norm.values() for v in values)[:MAX_SUGGESTIONS * 4]
+            if len(self._memo) >= 1024:
+                self._memo.clear()
+            self._memo[norm] = (matched, method, suggestions)
+        matched, method, suggestions = self._memo[norm]
+        result = {"requested": value, "matched": list(matched), "method": method}
+        if suggestions is not None:
+            result["suggestions"] = suggestions
+        return result
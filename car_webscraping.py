@@ -1,7 +1,15 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
-from bs4 import BeautifulSoup
-import requests, os
+from bs4 import BeautifulSoup, SoupStrainer
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from xml.etree import ElementTree
+import http_client
+from catalog_snapshot import CATALOG_SNAPSHOT_PATH, export_snapshot
 from dotenv import load_dotenv
 
 
@@ -10,55 +18,238 @@ SERVICE_ACCOUNT_KEY_PATH = os.getenv("SERVICE_ACCOUNT_KEY_PATH")
 
 
 TOYOTA_URL = os.getenv("TOYOTA_URL")
+# Comma-separated model/inventory pages or sitemaps; defaults to TOYOTA_URL
+TOYOTA_URLS = [u.strip() for u in os.getenv("TOYOTA_URLS", TOYOTA_URL or "").split(",") if u.strip()]
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "8"))
+SCRAPE_STATE_PATH = os.getenv("SCRAPE_STATE_PATH", ".scrape_state.json")
+BATCH_SIZE = 500  # Firestore limit of writes per batch
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+SYNC_CHANGELOG_PATH = os.getenv("SYNC_CHANGELOG_PATH", "catalog_changes.jsonl")
+# Scraped fields that make up a vehicle's content; bookkeeping fields are left out of the hash
+CAR_FIELDS = ("name", "price", "mileages_or_ranges", "make_year", "powertrain", "car_type", "car_image")
+
+
+def _parser_backend():
+   """lxml when installed, otherwise the stdlib html.parser."""
+   try:
+       import lxml  # noqa: F401
+       return "lxml"
+   except ImportError:
+       return "html.parser"
+
+
+
+
+SCRAPE_PARSER = os.getenv("SCRAPE_PARSER") or _parser_backend()
+CARD_STRAINER = SoupStrainer("div", class_="vehicle-card")
+
+
+
+
+def parse_card(card):
+   """Extracts one car dict from a div.vehicle-card, or None if data is missing."""
+   try:
+       name = card.find("div", class_="title heading-04").get_text(strip=True)
+
+
+       all_headers = card.find("div", class_="meta").find_all('div', class_='header body-01')
+       price = int(all_headers[0].get_text(strip=True).split("$")[1].replace(',', ''))
+       mileages_or_ranges = all_headers[1].get_text(strip=True)
+
+
+       make_year = card.find("div", class_="model-year label-01").get_text(strip=True)
+
+
+       top_label = card.find("div", class_="top-label label-01")
+       powertrain = "Gasoline" if top_label is None else top_label.get_text(strip=True)
+
+
+       car_type = card["data-category"].split(",")
+       car_image = card.find("div", class_="image-container").find("picture", class_="tcom-picture").find("img")["src"]
+
+
+   except AttributeError:
+       print("Skipping a card with missing data.")
+       return None
+
+
+   return {
+       "name": name,
+       "price": price,
+       "mileages_or_ranges": mileages_or_ranges,
+       "make_year": make_year,
+       "powertrain": powertrain,
+       "car_type": car_type,
+       "car_image": car_image
+   }
+
+
+
+
+def parse_cards(html, parser=None, strainer=CARD_STRAINER):
+   """
+   Yields car dicts from a model page. Only div.vehicle-card subtrees are
+   built (SoupStrainer), so memory tracks the cards rather than the page.
+   """
+   soup = BeautifulSoup(html, parser or SCRAPE_PARSER, parse_only=strainer)
+   for card in soup.find_all("div", class_="vehicle-card"):
+       car_data = parse_card(card)
+       if car_data is not None:
+           yield car_data
+
+
 
 
 def get_model_data(url):
-   response = requests.get(url)
-   soup = BeautifulSoup(response.text, "html.parser")
-   all_car_cards = soup.find_all("div", class_="vehicle-card")
-   print(len(all_car_cards))
-   car_data_list = []
+   response = http_client.get(url)
+   return list(parse_cards(response.text))
 
 
-   for card in all_car_cards:
-       try:
-           name = card.find("div", class_="title heading-04").get_text(strip=True)
 
 
-           meta_div = card.find("div", class_="meta")
-           all_headers = meta_div.find_all('div', class_='header body-01')
-           price = int(all_headers[0].get_text(strip=True).split("$")[1].replace(',', ''))
-           mileages_or_ranges = all_headers[1].get_text(strip=True) 
+def load_scrape_state():
+   """Returns the stored ETag/Last-Modified validators, keyed by URL."""
+   try:
+       with open(SCRAPE_STATE_PATH) as f:
+           return json.load(f)
+   except (FileNotFoundError, json.JSONDecodeError):
+       return {}
 
 
-           make_year = card.find("div", class_="model-year label-01").get_text(strip=True)
 
 
-           if card.find("div", class_="top-label label-01") == None:
-               powertrain = "Gasoline"
+def save_scrape_state(state):
+   with open(SCRAPE_STATE_PATH, "w") as f:
+       json.dump(state, f, indent=2)
+
+
+
+
+def expand_urls(urls):
+   """Replaces any sitemap (.xml) URL with the page URLs it lists."""
+   pages = []
+   for url in urls:
+       if not url.lower().endswith(".xml"):
+           pages.append(url)
+           continue
+       response = http_client.get(url)
+       response.raise_for_status()
+       root = ElementTree.fromstring(response.content)
+       pages.extend(
+           loc.text.strip() for loc in root.iter()
+           if loc.tag.rsplit("}", 1)[-1] == "loc" and loc.text
+       )
+   return pages
+
+
+
+
+def fetch_page(url, validators):
+   """
+   Conditional GET using the URL's stored validators.
+   Returns (html, new_validators); html is None when the page is unchanged (304).
+   """
+   headers = {}
+   if validators.get("etag"):
+       headers["If-None-Match"] = validators["etag"]
+   if validators.get("last_modified"):
+       headers["If-Modified-Since"] = validators["last_modified"]
+
+
+   response = http_client.get(url, headers=headers)
+   if response.status_code == 304:
+       return None, validators
+   response.raise_for_status()
+   return response.text, {
+       "etag": response.headers.get("ETag"),
+       "last_modified": response.headers.get("Last-Modified")
+   }
+
+
+
+
+def get_models_data(urls, pages=None):
+   """
+   Fetches every model/inventory page (or sitemap) concurrently and yields the
+   parsed cards of all changed pages as one stream. Unchanged pages answer 304
+   and are not parsed. Nothing is persisted here: when a dict is passed as
+   pages, it receives every page's scrape state entry (new validators and
+   document IDs when re-parsed, the stored entry on a 304 or fetch error, None
+   for a failed page never seen before), for retained_ids and, once the cars
+   are stored, commit_scrape_state. A stored entry without a "cars" list
+   predates sync, so its page is fetched in full rather than trusted on a 304.
+   """
+   state = load_scrape_state()
+   urls = expand_urls(urls)
+   skipped, parsed = 0, 0
+
+
+   def validators(url):
+       entry = state.get(url, {})
+       return entry if "cars" in entry else {}
+
+
+   with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as pool:
+       futures = {pool.submit(fetch_page, url, validators(url)): url for url in urls}
+       for future in as_completed(futures):
+           url = futures[future]
+           try:
+               html, new_validators = future.result()
+           except Exception as e:
+               print(f"Error fetching {url}: {e}")
+               html, new_validators = None, None
            else:
-               powertrain = card.find("div", class_="top-label label-01").get_text(strip=True)
-          
-           car_type = [data for data in card["data-category"].split(",")]
-           car_image = card.find("div", class_="image-container").find("picture", class_="tcom-picture").find("img")["src"]
+               skipped += html is None
+           if html is None:
+               if pages is not None:
+                   pages[url] = state.get(url)
+               continue
+           doc_ids = []
+           for car_data in parse_cards(html):
+               parsed += 1
+               doc_ids.append(car_doc_id(car_data))
+               yield car_data
+           if pages is not None:
+               pages[url] = dict(new_validators, cars=doc_ids)
+
+
+   print(f"Fetched {len(urls)} pages, {skipped} unchanged (304), parsed {parsed} cars")
+
 
 
-           car_data = {
-               "name": name,
-               "price": price,
-               "mileages_or_ranges": mileages_or_ranges,
-               "make_year": make_year,
-               "powertrain": powertrain,
-               "car_type": car_type,
-               "car_image": car_image
-           }
-           car_data_list.append(car_data)
 
+def retained_ids(pages):
+   """
+   Document IDs recorded for the scraped pages, so a sync does not mistake
+   the cars of a 304 or failed page for removed ones. None when a page has
+   no recorded IDs: its cars are unknown and nothing may be tombstoned.
+   """
+   retained = set()
+   for entry in pages.values():
+       if entry is None or "cars" not in entry:
+           return None
+       retained.update(entry["cars"])
+   return retained
 
-       except AttributeError:
-           print("Skipping a card with missing data.")
-      
-   return car_data_list
+
+
+
+def commit_scrape_state(pages, failed=()):
+   """
+   Saves the validators and IDs of the pages whose cars were all stored.
+   A page with a failed write keeps its previous entry, so the next run
+   fetches it again instead of getting a 304 for cars that never landed.
+   """
+   failed = set(failed)
+   state = load_scrape_state()
+   for url, entry in pages.items():
+       if entry is None:
+           continue
+       if failed.isdisjoint(entry.get("cars", ())):
+           state[url] = entry
+       else:
+           print(f"Not recording {url}: some of its cars failed to save")
+   save_scrape_state(state)
 
 
 
@@ -70,19 +261,234 @@ def initialize_firebase():
 
 
 
-def save_car_data(car_data_list):
-   db = firestore.client()
+def car_doc_id(car_data):
+   """Deterministic document ID from the vehicle's identity (name + model year + powertrain)."""
+   identity = "|".join(
+       str(car_data.get(field, "")).strip().lower() for field in ("name", "make_year", "powertrain")
+   )
+   return hashlib.sha1(identity.encode("utf-8")).hexdigest()[:20]
+
+
+
+
+def content_hash(car_data):
+   """Hash of the scraped content; equal hashes mean there is nothing to write."""
+   content = {field: car_data.get(field) for field in CAR_FIELDS}
+   return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+
+
+def _chunks(items, size):
+   chunk = []
+   for item in items:
+       chunk.append(item)
+       if len(chunk) == size:
+           yield chunk
+           chunk = []
+   if chunk:
+       yield chunk
+
+
+
+
+def _commit_batch(db, chunk):
+   batch = db.batch()
+   for car_data in chunk:
+       batch.set(db.collection("cars").document(car_doc_id(car_data)), car_data)
+   batch.commit()
+   return len(chunk)
+
+
+
+
+def save_car_data(car_data_list, db=None):
+   """
+   Upserts scraped cars in 500-document batched writes committed in parallel.
+   Document IDs come from car_doc_id, so re-running the scraper overwrites
+   instead of duplicating. db defaults to the default app's Firestore client.
+   """
+   db = db or firestore.client()
+   start = time.perf_counter()
+   saved, failed = 0, []
+
+
+   with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as pool:
+       futures = {
+           pool.submit(_commit_batch, db, chunk): chunk
+           for chunk in _chunks(car_data_list, BATCH_SIZE)
+       }
+       for future in as_completed(futures):
+           try:
+               saved += future.result()
+           except Exception as e:
+               chunk = futures[future]
+               failed.extend(car_doc_id(car_data) for car_data in chunk)
+               print(f"Error committing batch of {len(chunk)} cars: {e}")
+
+
+   elapsed = time.perf_counter() - start
+   rate = saved / elapsed if elapsed > 0 else 0.0
+   print(f"Saved {saved} cars in {elapsed:.2f}s ({rate:.1f} docs/s), {len(failed)} failed")
+   if failed:
+       print(f"Failed document IDs: {', '.join(failed)}")
+   return {"saved": saved, "failed": failed, "seconds": elapsed, "docs_per_second": rate}
+
+
+
+
+def _commit_ops(db, chunk):
+   batch = db.batch()
+   for op, doc_id, data in chunk:
+       ref = db.collection("cars").document(doc_id)
+       if op == "set":
+           batch.set(ref, data)
+       else:
+           batch.update(ref, data)
+   batch.commit()
+   return len(chunk)
+
+
+
+
+def _stored_cars(db):
+   """doc_id -> (content hash, removed flag, data) for every stored car."""
+   stored = {}
+   for doc in db.collection("cars").stream():
+       data = doc.to_dict() or {}
+       # Documents written before sync existed have no hash; derive it so they are not rewritten
+       stored[doc.id] = (data.get("content_hash") or content_hash(data), bool(data.get("removed")), data)
+   return stored
+
+
+
+
+def _describe(doc_id, car_data):
+   return {"id": doc_id, **{field: car_data.get(field) for field in ("name", "make_year", "powertrain")}}
+
+
+
+
+def diff_catalog(scraped, stored, retained=()):
+   """
+   Compares the scraped cars (doc_id -> car dict) with the stored ones.
+   Returns the write operations and the change log entries. Stored cars
+   neither scraped nor retained are tombstoned, not deleted; with retained
+   None (unknown) nothing is tombstoned.
+   """
+   now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+   ops, changes = [], {"added": [], "changed": [], "removed": []}
+
+
+   for doc_id, car_data in scraped.items():
+       digest = content_hash(car_data)
+       doc = dict(car_data, content_hash=digest, removed=False, synced_at=now)
+       if doc_id not in stored:
+           ops.append(("set", doc_id, doc))
+           changes["added"].append(_describe(doc_id, car_data))
+           continue
+       stored_hash, removed, stored_data = stored[doc_id]
+       if stored_hash != digest or removed:
+           ops.append(("set", doc_id, doc))
+           entry = _describe(doc_id, car_data)
+           entry["fields"] = [f for f in CAR_FIELDS if stored_data.get(f) != car_data.get(f)]
+           if removed:
+               entry["restored"] = True
+           changes["changed"].append(entry)
+
+
+   if retained is None:
+       return ops, changes
+   for doc_id, (_, removed, stored_data) in stored.items():
+       if removed or doc_id in scraped or doc_id in retained:
+           continue
+       ops.append(("update", doc_id, {"removed": True, "removed_at": now}))
+       entry = _describe(doc_id, stored_data)
+       if car_doc_id(stored_data) in scraped:
+           entry["duplicate_of"] = car_doc_id(stored_data)  # legacy add() copy of a live car
+       changes["removed"].append(entry)
+
+
+   return ops, changes
+
+
+
+
+def _append_changelog(changes, path):
+   record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), **changes}
+   with open(path, "a") as f:
+       f.write(json.dumps(record) + "\n")
+
+
+
+
+def sync_car_data(car_data_list, db=None, retained=(), changelog_path=SYNC_CHANGELOG_PATH):
+   """
+   Incremental sync of a scrape into the 'cars' collection. Each vehicle is
+   keyed by car_doc_id and carries a content hash: only new or changed cars
+   are written, and stored cars missing from the scrape (and not in
+   retained, see retained_ids) get removed=True instead of staying live.
+   Appends the added/changed/removed vehicles to the change log, so writes
+   track what changed rather than catalog size.
+   """
+   db = db or firestore.client()
+   start = time.perf_counter()
+   scraped = {}
    for car_data in car_data_list:
-       try:
-           doc_ref = db.collection("cars").add(car_data)
-           print(f"Added car with ID: {doc_ref[1].id}")
-       except Exception as e:
-           print(f"Error adding car data: {e}")
-   print("Car data saved successfully")
+       scraped[car_doc_id(car_data)] = car_data  # a car listed on several pages is one document
+   stored = _stored_cars(db)
+
+
+   if not scraped:
+       # A failed or empty scrape must not tombstone the whole catalog
+       print("Scrape returned no cars; leaving the catalog untouched.")
+       return {"added": 0, "changed": 0, "removed": 0, "unchanged": len(stored), "writes": 0,
+               "failed": [], "seconds": time.perf_counter() - start}
+
+
+   ops, changes = diff_catalog(scraped, stored, None if retained is None else set(retained))
+   written, failed = 0, []
+   with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as pool:
+       futures = {pool.submit(_commit_ops, db, chunk): chunk for chunk in _chunks(ops, BATCH_SIZE)}
+       for future in as_completed(futures):
+           try:
+               written += future.result()
+           except Exception as e:
+               chunk = futures[future]
+               failed.extend(doc_id for _, doc_id, _ in chunk)
+               print(f"Error committing batch of {len(chunk)} writes: {e}")
+
+
+   if changelog_path and ops:
+       _append_changelog(changes, changelog_path)
+   elapsed = time.perf_counter() - start
+   summary = {name: len(entries) for name, entries in changes.items()}
+   summary.update(unchanged=len(scraped) - summary["added"] - summary["changed"], writes=written,
+                  failed=failed, seconds=elapsed)
+   print(f"Synced {len(scraped)} scraped cars in {elapsed:.2f}s: {summary['added']} added, "
+         f"{summary['changed']} changed, {summary['removed']} removed, {summary['unchanged']} unchanged "
+         f"({written} writes, {len(failed)} failed)")
+   return summary
 
 
 
 
 if __name__ == "__main__":
+   parser = argparse.ArgumentParser(description="Scrape Toyota model pages into the Firestore 'cars' collection.")
+   parser.add_argument("--full", action="store_true",
+                       help="upsert every scraped car instead of syncing only the changes")
+   parser.add_argument("--snapshot", default=CATALOG_SNAPSHOT_PATH,
+                       help="columnar catalog snapshot to write afterwards ('' to skip)")
+   args = parser.parse_args()
+
+
    initialize_firebase()
-   save_car_data(get_model_data(TOYOTA_URL))
+   pages = {}
+   if args.full:
+       result = save_car_data(get_models_data(TOYOTA_URLS, pages=pages))
+   else:
+       cars = list(get_models_data(TOYOTA_URLS, pages))
+       result = sync_car_data(cars, retained=retained_ids(pages))
+   commit_scrape_state(pages, result["failed"])
+   if args.snapshot:
+       export_snapshot(firestore.client(), args.snapshot)
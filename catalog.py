@@ -0,0 +1,354 @@
+# catalog.py
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right, insort
+
+import numpy as np
+
+from canonical import ValueResolver, canonical_year, parse_efficiency
+from catalog_snapshot import CATALOG_SNAPSHOT_PATH, CatalogSnapshot, snapshot_exists, snapshot_mtime
+from metrics import span, FIRESTORE_SECONDS
+
+# How often a snapshot-backed catalog checks for a newer snapshot from the scraper
+SNAPSHOT_RELOAD_INTERVAL = float(os.getenv("SNAPSHOT_RELOAD_INTERVAL", "30"))
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+# car_image is left out by default; it only inflates the model prompt
+DEFAULT_FIELDS = ("name", "price", "make_year", "powertrain", "car_type", "mileages_or_ranges")
+
+
+class _CatalogQueries(ABC):
+    """
+    Filter resolution, paging and projection shared by the catalog backends.
+    Subclasses provide _lock, _stored_values(field) and _matches().
+    """
+
+    INDEXED_FIELDS = ("car_type", "powertrain", "make_year")
+
+    def _refresh(self):
+        """Hook run before each query; backends that can go stale reload here."""
+
+    @abstractmethod
+    def _stored_values(self, field):
+        """Distinct stored values of an indexed field."""
+
+    @abstractmethod
+    def _matches(self, resolved, max_price, min_range, descending):
+        """Returns (match count, fetch(start, stop) -> list of car dicts in price order)."""
+
+    def _resolver(self, field):
+        values = frozenset(self._stored_values(field))
+        cached = self._resolvers.get(field)
+        if cached is None or cached[0] != values:
+            cached = (values, ValueResolver(field, values))
+            self._resolvers[field] = cached
+        return cached[1]
+
+    def resolve_filters(self, car_type=None, make_year=None, powertrain=None) -> dict:
+        """
+        Maps free-form filter values onto stored values: "SUV" -> ["suvs"],
+        "hybrid" -> ["Hybrid EV", "Hybrid EV Available"], 2025.0 -> "2025".
+        Unmatched values resolve to [] and carry suggestions.
+        """
+        resolved = {}
+        with self._lock:
+            for field, value in (("car_type", car_type), ("powertrain", powertrain)):
+                if value:
+                    resolved[field] = self._resolver(field).resolve(value)
+            if make_year:
+                year = canonical_year(make_year)
+                years = set(self._stored_values("make_year"))
+                if year in years:
+                    resolved["make_year"] = {"requested": make_year, "matched": [year], "method": "exact"}
+                else:
+                    resolved["make_year"] = {"requested": make_year, "matched": [], "method": "none",
+                                             "suggestions": sorted(years)}
+        return resolved
+
+    def query(self, car_type=None, max_price=None, make_year=None, powertrain=None, min_range=None) -> list:
+        """Returns every car matching the given filters, ordered by price."""
+        with self._lock:
+            self._refresh()
+            resolved = self.resolve_filters(car_type=car_type, make_year=make_year, powertrain=powertrain)
+            count, fetch = self._matches(resolved, max_price, min_range, False)
+            return fetch(0, count)
+
+    def search(self, car_type=None, max_price=None, make_year=None, powertrain=None, min_range=None,
+               select=None, descending=False, limit=DEFAULT_PAGE_SIZE, cursor=None) -> dict:
+        """
+        One page of matches ordered by price, projected to the selected fields.
+        Reports the total match count, how each filter was resolved against
+        the stored values and an opaque cursor for the next page.
+        """
+        with self._lock:
+            self._refresh()
+            resolved = self.resolve_filters(car_type=car_type, make_year=make_year, powertrain=powertrain)
+            # Cursors are tied to the resolved filters, so "SUV" and "suvs" share pages
+            filters = [sorted(resolved[f]["matched"]) if f in resolved else None for f in self.INDEXED_FIELDS]
+            filters += [None if max_price is None else float(max_price),
+                        None if min_range is None else float(min_range), bool(descending)]
+            offset = _decode_cursor(cursor, filters) if cursor else 0
+            limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+            fields = set(select or DEFAULT_FIELDS) | {"id"}
+
+            total, fetch = self._matches(resolved, max_price, min_range, bool(descending))
+            page = [{k: v for k, v in car.items() if k in fields} for car in fetch(offset, offset + limit)]
+
+        next_offset = offset + limit
+        result = {
+            "total_matches": total,
+            "cars": page,
+            "next_cursor": _encode_cursor(next_offset, filters) if next_offset < total else None
+        }
+        for name, value in (("max_price", max_price), ("min_range", min_range)):
+            if value is not None:
+                resolved[name] = {"requested": value, "matched": [float(value)], "method": "exact"}
+        if resolved:
+            result["resolved_filters"] = resolved
+        return result
+
+
+class CarCatalog(_CatalogQueries):
+    """
+    Process-local copy of the Firestore 'cars' collection.
+
+    Keeps inverted indexes on car_type, powertrain and make_year plus a
+    sorted price column, so find_cars never has to hit Firestore. A
+    collection on_snapshot listener keeps the indexes current when the
+    scraper writes new data; tombstoned (removed) cars are left out. Each
+    car also gets the numeric mpg_city, mpg_highway and range_mi fields
+    parsed from its mileages_or_ranges label.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._cars = {}
+        self._index = {field: {} for field in self.INDEXED_FIELDS}
+        self._resolvers = {}  # field -> (distinct stored values, ValueResolver)
+        self._price_column = []  # sorted (price, doc_id) pairs
+        self._watch = None
+        self.loaded = False
+
+    def load(self, db):
+        """Loads every car once and attaches the live listener."""
+        with self._lock, span(FIRESTORE_SECONDS, op="catalog_load"):
+            for doc in db.collection('cars').stream():
+                self._upsert(doc.id, doc.to_dict())
+            self.loaded = True
+        print(f"[Catalog] Loaded {len(self._cars)} cars.")
+        self._watch = db.collection('cars').on_snapshot(self._on_snapshot)
+
+    def close(self):
+        """Detaches the Firestore listener."""
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, col_snapshot, changes, read_time):
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    self._remove(doc.id)
+                else:
+                    self._upsert(doc.id, doc.to_dict())
+
+    @staticmethod
+    def _keys(field, value):
+        if value is None:
+            return []
+        if field == "make_year":
+            year = canonical_year(value)
+            return [year] if year else []
+        if field == "car_type" and isinstance(value, list):
+            return [str(v) for v in value]
+        return [str(value)]
+
+    def _upsert(self, doc_id, data):
+        self._remove(doc_id)
+        if data.get("removed"):
+            return  # tombstoned by the scraper's incremental sync
+        data = dict(data, **parse_efficiency(data.get("mileages_or_ranges")))
+        self._cars[doc_id] = data
+        for field in self.INDEXED_FIELDS:
+            for key in self._keys(field, data.get(field)):
+                self._index[field].setdefault(key, set()).add(doc_id)
+        price = data.get("price")
+        if isinstance(price, (int, float)):
+            insort(self._price_column, (price, doc_id))
+
+    def _remove(self, doc_id):
+        data = self._cars.pop(doc_id, None)
+        if data is None:
+            return
+        for field in self.INDEXED_FIELDS:
+            for key in self._keys(field, data.get(field)):
+                ids = self._index[field].get(key)
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del self._index[field][key]
+        price = data.get("price")
+        if isinstance(price, (int, float)):
+            pos = bisect_right(self._price_column, (price, doc_id)) - 1
+            if pos >= 0 and self._price_column[pos] == (price, doc_id):
+                del self._price_column[pos]
+
+    def _ids_under(self, max_price):
+        pos = bisect_right(self._price_column, (max_price, chr(0x10FFFF)))
+        return {doc_id for _, doc_id in self._price_column[:pos]}
+
+    def _stored_values(self, field):
+        return self._index[field].keys()
+
+    def _matches(self, resolved, max_price, min_range, descending):
+        candidates = []
+        for field, resolution in resolved.items():
+            index = self._index[field]
+            candidates.append(set().union(*(index.get(key, set()) for key in resolution["matched"])))
+        if max_price is not None:
+            candidates.append(self._ids_under(max_price))
+
+        if candidates:
+            candidates.sort(key=len)
+            ids = set(candidates[0]).intersection(*candidates[1:])
+        else:
+            ids = set(self._cars)
+        cars = [dict(self._cars[doc_id], id=doc_id) for doc_id in ids]
+        if min_range is not None:
+            cars = [car for car in cars if car.get("range_mi") is not None and car["range_mi"] >= min_range]
+        cars.sort(key=lambda car: (car.get("price") is None, car.get("price") or 0, car["id"]), reverse=descending)
+        return len(cars), lambda start, stop: cars[start:stop]
+
+    def __len__(self):
+        return len(self._cars)
+
+
+class SnapshotCatalog(_CatalogQueries):
+    """
+    Catalog served straight from the scraper's memory-mapped columnar
+    snapshot. Filters are vectorized masks over the mapped columns and only
+    the requested page is materialized as dicts, so every worker on a host
+    shares the page cache instead of holding its own copy, and cold start
+    never reads Firestore. A newer snapshot is picked up within
+    SNAPSHOT_RELOAD_INTERVAL seconds.
+    """
+
+    def __init__(self, path=CATALOG_SNAPSHOT_PATH, reload_interval=SNAPSHOT_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.RLock()
+        self._resolvers = {}
+        self._snapshot = None
+        self._years = ()
+        self._mtime = None
+        self._checked_at = 0.0
+        self.loaded = False
+
+    def load(self, db=None):
+        """Maps the snapshot; db is accepted for parity with CarCatalog and not used."""
+        with self._lock:
+            self._mtime = snapshot_mtime(self.path)
+            self._snapshot = CatalogSnapshot(self.path)
+            self._years = tuple(str(y) for y in np.unique(self._snapshot["make_year"]) if y)
+            self._checked_at = time.monotonic()
+            self.loaded = True
+        print(f"[Catalog] Mapped {len(self._snapshot)} cars from snapshot {self.path} "
+              f"({self._snapshot.meta['created_at']}).")
+
+    def close(self):
+        pass
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        mtime = snapshot_mtime(self.path)
+        if mtime is not None and mtime != self._mtime:
+            try:
+                self.load()
+            except (OSError, ValueError) as e:
+                print(f"[Catalog] Keeping the current snapshot; reload failed: {e}")
+
+    def _stored_values(self, field):
+        if field == "make_year":
+            return self._years
+        return self._snapshot.dictionaries[field]
+
+    def _matches(self, resolved, max_price, min_range, descending):
+        snapshot = self._snapshot
+        mask = np.ones(len(snapshot), dtype=bool)
+        if "car_type" in resolved:
+            mask &= (snapshot["car_type"] & snapshot.car_type_mask(resolved["car_type"]["matched"])) != 0
+        if "powertrain" in resolved:
+            mask &= np.isin(snapshot["powertrain"], snapshot.powertrain_codes(resolved["powertrain"]["matched"]))
+        if "make_year" in resolved:
+            mask &= np.isin(snapshot["make_year"], [int(y) for y in resolved["make_year"]["matched"]])
+        if max_price is not None:
+            mask &= snapshot["price"] <= float(max_price)  # NaN (unpriced) never matches
+        if min_range is not None:
+            mask &= snapshot["range_mi"] >= float(min_range)
+
+        order = snapshot["price_order"]
+        rows = order[mask[order]]
+        if descending:
+            rows = rows[::-1]
+        return len(rows), lambda start, stop: [snapshot.row(i) for i in rows[start:stop]]
+
+    def __len__(self):
+        return len(self._snapshot) if self._snapshot is not None else 0
+
+
+def _filters_digest(filters):
+    return hashlib.sha1(json.dumps(filters, default=str).encode("utf-8")).hexdigest()[:8]
+
+
+def _encode_cursor(offset, filters):
+    token = json.dumps({"o": offset, "f": _filters_digest(filters)})
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor, filters):
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(token["o"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if token.get("f") != _filters_digest(filters):
+        raise ValueError("Cursor was issued for different filters")
+    return offset
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(db):
+    """
+    Returns the process-wide catalog (singleton), loading it on first use:
+    from the columnar snapshot at CATALOG_SNAPSHOT_PATH when the scraper has
+    written one, otherwise from Firestore.
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                catalog = SnapshotCatalog() if snapshot_exists() else CarCatalog()
+                catalog.load(db)
+                _catalog = catalog
+    return _catalog
+
+
+def close_catalog():
+    """Detaches and drops the process-wide catalog, if one was loaded."""
+    global _catalog
+    with _catalog_lock:
+        catalog, _catalog = _catalog, None
+    if catalog is not None:
+        catalog.close()
@@ -0,0 +1,213 @@
+# catalog_snapshot.py
+import glob
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from canonical import canonical_year, parse_efficiency
+
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", "catalog_snapshot")
+SNAPSHOT_VERSION = 1
+
+STRING_COLUMNS = ("id", "name", "mileages_or_ranges", "car_image")
+FLOAT_COLUMNS = ("mpg_city", "mpg_highway", "range_mi")
+MAX_CAR_TYPES = 64  # car_type is one uint64 bitset per row
+
+
+def _encode_strings(values):
+    """Variable-width strings as one UTF-8 byte blob plus int64 row offsets."""
+    encoded = [("" if v is None else str(v)).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8) if encoded else np.zeros(0, dtype=np.uint8)
+    return blob, offsets
+
+
+def _car_types(value):
+    if value is None:
+        return []
+    return [str(v) for v in value] if isinstance(value, list) else [str(value)]
+
+
+def build_columns(cars):
+    """
+    Typed columns for an iterable of car dicts carrying an "id": prices and
+    parsed MPG/range as floats (NaN when missing), make_year as int16 (0),
+    powertrain dictionary-encoded (-1), car_type as a bitset over its
+    dictionary, the remaining text as blob/offset pairs, plus the row order
+    by price.
+    """
+    cars = list(cars)
+    powertrains = sorted({str(c["powertrain"]) for c in cars if c.get("powertrain") is not None})
+    car_types = sorted({t for c in cars for t in _car_types(c.get("car_type"))})
+    if len(car_types) > MAX_CAR_TYPES:
+        raise ValueError(f"{len(car_types)} distinct car_type values; the bitset holds {MAX_CAR_TYPES}")
+    powertrain_codes = {value: code for code, value in enumerate(powertrains)}
+    car_type_bits = {value: 1 << bit for bit, value in enumerate(car_types)}
+
+    n = len(cars)
+    columns = {
+        "price": np.full(n, np.nan, dtype=np.float64),
+        "make_year": np.zeros(n, dtype=np.int16),
+        "powertrain": np.full(n, -1, dtype=np.int16),
+        "car_type": np.zeros(n, dtype=np.uint64),
+    }
+    columns.update({name: np.full(n, np.nan, dtype=np.float32) for name in FLOAT_COLUMNS})
+    for i, car in enumerate(cars):
+        if isinstance(car.get("price"), (int, float)):
+            columns["price"][i] = car["price"]
+        year = canonical_year(car.get("make_year"))
+        if year:
+            columns["make_year"][i] = int(year)
+        if car.get("powertrain") is not None:
+            columns["powertrain"][i] = powertrain_codes[str(car["powertrain"])]
+        columns["car_type"][i] = sum(car_type_bits[t] for t in set(_car_types(car.get("car_type"))))
+        for name, value in parse_efficiency(car.get("mileages_or_ranges")).items():
+            if value is not None:
+                columns[name][i] = value
+
+    ids = [str(car["id"]) for car in cars]
+    for name in STRING_COLUMNS:
+        blob, offsets = _encode_strings(ids if name == "id" else [car.get(name) for car in cars])
+        columns[f"{name}.bytes"], columns[f"{name}.offsets"] = blob, offsets
+
+    # Ascending price, unpriced cars last, ties by id; descending reads it backwards
+    by_id = np.argsort(np.array(ids, dtype=object), kind="stable")
+    order = by_id[np.argsort(np.nan_to_num(columns["price"][by_id], nan=np.inf), kind="stable")]
+    columns["price_order"] = order.astype(np.int32)
+
+    dictionaries = {"powertrain": powertrains, "car_type": car_types}
+    return columns, dictionaries
+
+
+def write_snapshot(cars, path=CATALOG_SNAPSHOT_PATH, source=None) -> dict:
+    """
+    Writes cars as a directory of .npy columns plus meta.json next to path
+    (path.v<timestamp>) and atomically repoints the path symlink at it, so
+    readers never see a half-written or missing snapshot. The previous
+    version is kept for workers still opening or mapping it; older ones
+    are removed.
+    """
+    columns, dictionaries = build_columns(cars)
+    rows = len(columns["price"])
+    version = f"{path}.v{time.time_ns()}"
+    os.makedirs(version)
+    for name, array in columns.items():
+        np.save(os.path.join(version, f"{name}.npy"), array)
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "rows": rows,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "source": source,
+        "dictionaries": dictionaries,
+        "columns": sorted(columns),
+    }
+    with open(os.path.join(version, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    if os.path.isdir(path) and not os.path.islink(path):
+        # A plain directory from before versioned snapshots; moved aside once, not atomically
+        previous = f"{path}.v0"
+        os.replace(path, previous)
+    link = f"{path}.link-{os.getpid()}"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, path)
+
+    keep = {os.path.realpath(version), previous}
+    for old in glob.glob(f"{glob.escape(path)}.v*"):
+        if os.path.realpath(old) not in keep:
+            shutil.rmtree(old, ignore_errors=True)
+    print(f"[Snapshot] Wrote {rows} cars to {path} -> {os.path.basename(version)}.")
+    return meta
+
+
+def snapshot_exists(path=CATALOG_SNAPSHOT_PATH) -> bool:
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+
+def snapshot_mtime(path=CATALOG_SNAPSHOT_PATH):
+    try:
+        return os.stat(os.path.join(path, "meta.json")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class CatalogSnapshot:
+    """
+    Read side of a snapshot: every column is memory-mapped read-only, so all
+    worker processes on a host share one page-cached copy and opening it
+    costs a few file maps rather than a Firestore read per car.
+    """
+
+    def __init__(self, path=CATALOG_SNAPSHOT_PATH):
+        self.path = path
+        # Resolve the symlink once so meta and columns come from the same version
+        path = os.path.realpath(path)
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported catalog snapshot version {self.meta.get('version')}")
+        self.dictionaries = self.meta["dictionaries"]
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in self.meta["columns"]
+        }
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def _string(self, name, i):
+        offsets = self.columns[f"{name}.offsets"]
+        return bytes(self.columns[f"{name}.bytes"][offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def car_type_mask(self, values):
+        """Bitmask selecting any of the given car_type values."""
+        bits = 0
+        for value in values:
+            if value in self.dictionaries["car_type"]:
+                bits |= 1 << self.dictionaries["car_type"].index(value)
+        return np.uint64(bits)
+
+    def powertrain_codes(self, values):
+        return [self.dictionaries["powertrain"].index(v) for v in values if v in self.dictionaries["powertrain"]]
+
+    def row(self, i) -> dict:
+        """Row i in the shape of a 'cars' document (plus the parsed efficiency fields)."""
+        i = int(i)
+        price = float(self.columns["price"][i])
+        year = int(self.columns["make_year"][i])
+        powertrain = int(self.columns["powertrain"][i])
+        bits = int(self.columns["car_type"][i])
+        car = {
+            "id": self._string("id", i),
+            "name": self._string("name", i),
+            "price": None if np.isnan(price) else (int(price) if price.is_integer() else price),
+            "mileages_or_ranges": self._string("mileages_or_ranges", i),
+            "make_year": str(year) if year else None,
+            "powertrain": self.dictionaries["powertrain"][powertrain] if powertrain >= 0 else None,
+            "car_type": [t for bit, t in enumerate(self.dictionaries["car_type"]) if bits >> bit & 1],
+            "car_image": self._string("car_image", i),
+        }
+        for name in FLOAT_COLUMNS:
+            value = float(self.columns[name][i])
+            car[name] = None if np.isnan(value) else value
+        return car
+
+
+def export_snapshot(db, path=CATALOG_SNAPSHOT_PATH) -> dict:
+    """Writes a snapshot of every live (not tombstoned) car in the 'cars' collection."""
+    cars = []
+    for doc in db.collection('cars').stream():
+        data = doc.to_dict() or {}
+        if not data.get("removed"):
+            cars.append(dict(data, id=doc.id))
+    return write_snapshot(cars, path, source="firestore:cars")
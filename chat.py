@@ -1,23 +1,42 @@
 import os
 import json
-from flask import Blueprint, jsonify
+import math
+import hashlib
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from flask import Blueprint, Response, jsonify, request
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.protobuf import json_format
+from session_store import get_session_store, compact_history
+from tool_dispatcher import ToolDispatcher, CachePolicy, NO_CACHE, normalize_args
+from geo_cache import normalize_address
+from metrics import (
+    span, LLM_SECONDS, CHAT_TURN_SECONDS, TURN_PROMPT_TOKENS, TURN_RESPONSE_TOKENS,
+    LLM_TOKENS, TOOL_SECONDS
+)
+from catalog import get_catalog, close_catalog
+from prefetch import get_prefetcher
+from response_cache import get_response_cache, conversation_state, is_personal
+from rate_limit import RateLimited, get_limiter, request_scope
 from firebase_tools import (
+    get_firestore_client,
     find_cars,
     get_financial_information,
     find_toyota_dealerships,
-    financialPlan
+    financialPlan,
+    financialQuotes
 )
 
 
 main = Blueprint('main', __name__)
 
-# # Configure Gemini
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Wall-clock budget for one chat turn, Gemini round trips and tools included
+CHAT_TURN_TIMEOUT = float(os.getenv("CHAT_TURN_TIMEOUT", "90"))
 
-for m in genai.list_models():
-    if 'generateContent' in m.supported_generation_methods:
-        print(m.name)
 # Define tools/functions for Gemini
 tools = [
     {
@@ -38,7 +57,12 @@ tools = [
             },
             {
                 "name": "find_cars",
-                "description": "Search for Toyota cars based on criteria",
+                "description": (
+                    "Search for Toyota cars based on criteria. Returns the total number of matches "
+                    "and one page of cars ordered by price; pass next_cursor back to get the next page. "
+                    "Filter values are matched loosely (synonyms, plurals, typos); resolved_filters "
+                    "reports what each one matched and unmatched filters list suggestions"
+                ),
                 "parameters": {
                     "type": "object",
                     "properties": {
@@ -57,6 +81,31 @@ tools = [
                         "powertrain": {
                             "type": "string",
                             "description": "Powertrain type (gas, hybrid, electric)"
+                        },
+                        "min_range": {
+                            "type": "number",
+                            "description": "Minimum electric driving range in miles (EVs and plug-in hybrids)"
+                        },
+                        "select": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": (
+                                "Fields to return: name, price, make_year, powertrain, car_type, "
+                                "mileages_or_ranges, mpg_city, mpg_highway, range_mi, car_image "
+                                "(default: all but car_image and the numeric mpg/range fields)"
+                            )
+                        },
+                        "sort": {
+                            "type": "string",
+                            "description": "price_asc (default) or price_desc"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Number of cars per page (default 10, max 50)"
+                        },
+                        "cursor": {
+                            "type": "string",
+                            "description": "next_cursor from a previous find_cars result with the same filters"
                         }
                     }
                 }
@@ -101,13 +150,345 @@ tools = [
                     },
                     "required": ["typeOfPayment", "userId", "price"]
                 }
+            },
+            {
+                "name": "financialQuotes",
+                "description": "Quote financing or leasing for several cars, down payments and loan terms in one call",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "typeOfPayment": {
+                            "type": "string",
+                            "description": "Type of payment plan (finance or lease)"
+                        },
+                        "userId": {
+                            "type": "string",
+                            "description": "User identifier"
+                        },
+                        "prices": {
+                            "type": "array",
+                            "items": {"type": "number"},
+                            "description": "Car prices to quote, e.g. every price returned by find_cars"
+                        },
+                        "downPayments": {
+                            "type": "array",
+                            "items": {"type": "number"},
+                            "description": "Down payment amounts to quote"
+                        },
+                        "terms": {
+                            "type": "array",
+                            "items": {"type": "integer"},
+                            "description": "Loan/lease terms in months (default 36, 48, 60, 72)"
+                        },
+                        "creditScores": {
+                            "type": "array",
+                            "items": {"type": "integer"},
+                            "description": (
+                                "Credit scores to compare APR tiers for, e.g. what improving the score "
+                                "would save (default: quote only at the user's own APR)"
+                            )
+                        }
+                    },
+                    "required": ["typeOfPayment", "userId", "prices", "downPayments"]
+                }
             }
         ]
     }
 ]
 
+TOOL_FUNCTIONS = {
+    "find_cars": find_cars.func,
+    "get_financial_information": get_financial_information.func,
+    "find_toyota_dealerships": find_toyota_dealerships.func,
+    "financialPlan": lambda typeOfPayment, userId, price: financialPlan(typeOfPayment, userId, *price),
+    "financialQuotes": lambda typeOfPayment, userId, prices, downPayments, terms=(36, 48, 60, 72),
+                              creditScores=None:
+        financialQuotes(typeOfPayment, userId, list(prices), list(downPayments), list(terms),
+                        list(creditScores) if creditScores else None),
+}
+
+
+# Tools whose data the session-start prefetch warms: (prefetch policy, claim key)
+TOOL_PREFETCH_KEYS = {
+    "get_financial_information": ("financial", lambda args: args.get("user_id")),
+    "financialPlan": ("financial", lambda args: args.get("userId")),
+    "financialQuotes": ("financial", lambda args: args.get("userId")),
+    "find_toyota_dealerships": ("location", lambda args: normalize_address(str(args.get("address") or ""))),
+}
+
+
+def execute_tool(tool_name, args):
+    """Runs one Gemini function call against the matching Python tool."""
+    tool_fn = TOOL_FUNCTIONS.get(tool_name)
+    if tool_fn is None:
+        return {"error": f"Unknown tool: {tool_name}"}
+    try:
+        prefetch_key = TOOL_PREFETCH_KEYS.get(tool_name)
+        if prefetch_key is not None:
+            policy, key_fn = prefetch_key
+            get_prefetcher().claim(policy, key_fn(args))
+        with span(TOOL_SECONDS, tool=tool_name):
+            return tool_fn(**args)
+    except RateLimited:
+        raise  # fails the turn with a 429 instead of feeding the model an error
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _find_cars_key(args):
+    # Cursors are case-sensitive tokens; normalize everything else
+    key = normalize_args({k: v for k, v in args.items() if k != "cursor"})
+    if args.get("cursor"):
+        key["cursor"] = args["cursor"]
+    return key
+
+
+def _dealership_key(args):
+    return {
+        "address": normalize_address(str(args.get("address", ""))),
+        "radius": int(args.get("radius") or 8000)
+    }
+
+
+# User-specific tools opt out; they have their own per-user cache
+TOOL_CACHE_POLICIES = {
+    "find_cars": CachePolicy(ttl=60, normalize=_find_cars_key),
+    "find_toyota_dealerships": CachePolicy(ttl=3600, normalize=_dealership_key),
+    "get_financial_information": NO_CACHE,
+    "financialPlan": NO_CACHE,
+    "financialQuotes": NO_CACHE,
+}
+
+tool_dispatcher = ToolDispatcher(execute_tool, TOOL_CACHE_POLICIES)
+
+
+def call_tool(tool_name, args):
+    """Routes a tool call through the memoizing, single-flight dispatcher."""
+    return tool_dispatcher.call(tool_name, args)
+
+
+def function_calls(response):
+    """Returns every function_call part of the model's latest turn."""
+    return [
+        part.function_call
+        for part in response.candidates[0].content.parts
+        if hasattr(part, "function_call") and part.function_call
+    ]
+
+
+async def run_tool_calls(calls):
+    """Executes all function calls of one model turn concurrently."""
+    results = await asyncio.gather(*(
+        asyncio.to_thread(call_tool, call.name, dict(call.args)) for call in calls
+    ))
+    return genai.protos.Content(parts=[
+        genai.protos.Part(
+            function_response=genai.protos.FunctionResponse(
+                name=call.name,
+                response={"result": result}
+            )
+        )
+        for call, result in zip(calls, results)
+    ])
+
+
+def _add_usage(response, usage):
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata:
+        usage["prompt"] += metadata.prompt_token_count
+        usage["response"] += metadata.candidates_token_count
+
+
+def _record_turn_usage(usage):
+    TURN_PROMPT_TOKENS.observe(usage["prompt"])
+    TURN_RESPONSE_TOKENS.observe(usage["response"])
+    LLM_TOKENS.inc(usage["prompt"], kind="prompt")
+    LLM_TOKENS.inc(usage["response"], kind="response")
+
+
+async def _send_message(chat_session, message, usage):
+    # Flask runs each async view on a fresh event loop, and genai's async gRPC
+    # channel stays bound to the loop that created it; the sync call on a
+    # worker thread, as the tools run, keeps the process-wide model loop-free.
+    limiter = get_limiter("gemini")
+    async with limiter.acquire_async():
+        with span(LLM_SECONDS, call="send_message"):
+            try:
+                response = await asyncio.to_thread(chat_session.send_message, message)
+            except google_exceptions.ResourceExhausted as e:
+                raise limiter.throttled() from e
+    _add_usage(response, usage)
+    return response
+
+
+async def run_turn(chat_session, user_message):
+    """
+    Sends a user message and resolves tool calls until the model answers in
+    text. Every function call in a turn runs concurrently and all results go
+    back in a single message.
+    """
+    usage = {"prompt": 0, "response": 0}
+    response = await _send_message(chat_session, user_message, usage)
+    calls = function_calls(response)
+    while calls:
+        tool_results = await run_tool_calls(calls)
+        response = await _send_message(chat_session, tool_results, usage)
+        calls = function_calls(response)
+    _record_turn_usage(usage)
+    return response
+
+
+def sse_event(event, payload):
+    """Formats one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+_STREAM_END = object()
+
+
+def _pump_stream(chat_session, message, chunks):
+    """
+    Reads one streamed Gemini reply into the chunks queue, then puts
+    _STREAM_END (or the exception). The gemini limiter slot is held only
+    while Gemini streams, never while a slow SSE client reads the tokens.
+    """
+    try:
+        limiter = get_limiter("gemini")
+        with limiter.acquire(), span(LLM_SECONDS, call="stream"):
+            try:
+                for chunk in chat_session.send_message(message, stream=True):
+                    chunks.put(chunk)
+            except google_exceptions.ResourceExhausted as e:
+                raise limiter.throttled() from e
+    except Exception as e:
+        chunks.put(e)
+    else:
+        chunks.put(_STREAM_END)
+
+
+def stream_turn(chat_session, user_message, deadline=None):
+    """
+    Streaming variant of run_turn: yields SSE 'token' events as Gemini
+    produces text, 'tool' events while function calls run, then 'done'.
+    Past the monotonic deadline no further Gemini round trip is started.
+    Returns True once 'done' is sent; after an 'error' event it returns
+    False and the session history may end in an unanswered function call.
+    """
+    reply = []
+    usage = {"prompt": 0, "response": 0}
+    try:
+        message = user_message
+        while True:
+            if deadline is not None and time.monotonic() > deadline:
+                yield sse_event("error", {"error": "The chat turn timed out"})
+                return False
+            calls = []
+            chunk = None
+            chunks = queue.SimpleQueue()
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(_pump_stream, chat_session, message, chunks),
+                name="gemini-stream", daemon=True
+            ).start()
+            while (item := chunks.get()) is not _STREAM_END:
+                if isinstance(item, Exception):
+                    raise item
+                chunk = item
+                for part in chunk.candidates[0].content.parts:
+                    if hasattr(part, "function_call") and part.function_call:
+                        calls.append(part.function_call)
+                    elif part.text:
+                        reply.append(part.text)
+                        yield sse_event("token", {"text": part.text})
+            # The last chunk carries the usage totals for the request
+            _add_usage(chunk, usage)
+            if not calls:
+                break
+            for call in calls:
+                yield sse_event("tool", {"name": call.name, "status": f"calling {call.name}…"})
+            message = asyncio.run(run_tool_calls(calls))
+    except RateLimited as e:
+        yield sse_event("error", {"error": str(e), "retry_after": math.ceil(e.retry_after)})
+        return False
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+        return False
+    _record_turn_usage(usage)
+    yield sse_event("done", {"reply": "".join(reply)})
+    return True
+
+
+def _text_turns(history):
+    """(role, text) for each prior turn, or None once a tool call or result is in the history."""
+    turns = []
+    for content in history:
+        if any(part.function_call or part.function_response for part in content.parts):
+            return None
+        turns.append((content.role, "".join(part.text for part in content.parts if part.text)))
+    return turns
+
+
+def cached_reply(chat_session, user_id, user_message):
+    """
+    Looks the turn up in the semantic response cache. Returns (state, reply):
+    reply is the cached answer (already appended to the session history) or
+    None, and state is None when the turn must not be cached at all.
+    """
+    cache = get_response_cache()
+    if not cache.enabled:
+        return None, None
+    turns = _text_turns(chat_session.history)
+    if turns is None or is_personal(user_message, user_id) or any(
+            is_personal(text, user_id) for role, text in turns if role == "user"):
+        cache.bypass()
+        return None, None
+
+    state = conversation_state(RESPONSE_CACHE_NAMESPACE, turns)
+    hit = cache.lookup(state, user_message)
+    if hit is None:
+        return state, None
+    reply, _ = hit
+    chat_session.history = list(chat_session.history) + [
+        genai.protos.Content(role="user", parts=[genai.protos.Part(text=user_message)]),
+        genai.protos.Content(role="model", parts=[genai.protos.Part(text=reply)]),
+    ]
+    return state, reply
+
+
+def remember_reply(chat_session, state, user_message, history_len):
+    """Caches the turn's reply unless it called tools (their results are data, not phrasing)."""
+    if state is None:
+        return
+    new_contents = chat_session.history[history_len:]
+    if not new_contents or any(
+            part.function_call or part.function_response
+            for content in new_contents for part in content.parts):
+        return
+    if new_contents[-1].role != "model":
+        return
+    reply = "".join(part.text for part in new_contents[-1].parts if part.text)
+    get_response_cache().store(state, user_message, reply)
+
+
+def load_chat_session(user_id):
+    """Rebuilds the user's ChatSession from the shared session store."""
+    history = get_session_store().get(user_id) or []
+    return get_model().start_chat(history=[
+        genai.protos.Content.from_json(json.dumps(content)) for content in history
+    ])
+
+
+def save_chat_session(user_id, chat_session):
+    """Writes the (compacted) history back to the session store."""
+    history = [
+        json_format.MessageToDict(genai.protos.Content.pb(content))
+        for content in chat_session.history
+    ]
+    get_session_store().put(user_id, compact_history(history))
+
+
 @main.route("/api/chat", methods=["POST"])
-def chat_api():
+async def chat_api():
     data = request.json
     user_id = data.get("user_id")
     user_message = data.get("message")
@@ -115,130 +496,132 @@ def chat_api():
     if not user_id or not user_message:
         return jsonify({"error": "user_id and message are required"}), 400
 
-    # Create new session if none exists
-    if user_id not in sessions:
-        sessions[user_id] = model.start_chat(history=[])
-
-    chat_session = sessions[user_id]
-
-    # Send user message
-    response = chat_session.send_message(user_message)
-
-    # If model triggers tool call
-    for part in response.candidates[0].content.parts:
-        if hasattr(part, "function_call") and part.function_call:
-            tool_name = part.function_call.name
-            args = dict(part.function_call.args)
-
-            tool_result = call_tool(tool_name, args)
-
-            # Send tool result back
-            response = chat_session.send_message(
-                genai.protos.Content(parts=[
-                    genai.protos.Part(
-                        function_response=genai.protos.FunctionResponse(
-                            name=tool_name,
-                            response={"result": tool_result}
-                        )
-                    )
-                ])
-            )
+    # Warm the user's financial profile and saved location while Gemini thinks
+    get_prefetcher().start(user_id)
+    chat_session = load_chat_session(user_id)
+    deadline = time.monotonic() + CHAT_TURN_TIMEOUT
+
+    if data.get("stream"):
+        def stream_and_save():
+            with request_scope(user_id, deadline), span(CHAT_TURN_SECONDS, mode="stream"):
+                state, reply = cached_reply(chat_session, user_id, user_message)
+                if reply is not None:
+                    yield sse_event("token", {"text": reply})
+                    yield sse_event("done", {"reply": reply})
+                else:
+                    history_len = len(chat_session.history)
+                    if not (yield from stream_turn(chat_session, user_message, deadline=deadline)):
+                        # As in the JSON path, a half-finished turn is not saved
+                        return
+                    remember_reply(chat_session, state, user_message, history_len)
+            save_chat_session(user_id, chat_session)
+
+        return Response(
+            stream_and_save(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    with request_scope(user_id, deadline), span(CHAT_TURN_SECONDS, mode="json"):
+        state, reply = cached_reply(chat_session, user_id, user_message)
+        if reply is None:
+            history_len = len(chat_session.history)
+            try:
+                response = await asyncio.wait_for(run_turn(chat_session, user_message), CHAT_TURN_TIMEOUT)
+            except asyncio.TimeoutError:
+                # The half-finished turn is not saved; the user can simply retry
+                return jsonify({"error": "The chat turn timed out"}), 504
+            except RateLimited as e:
+                retry_after = math.ceil(e.retry_after)
+                return jsonify({"error": str(e), "retry_after": retry_after}), 429, {"Retry-After": str(retry_after)}
+            reply = response.text
+            remember_reply(chat_session, state, user_message, history_len)
+    save_chat_session(user_id, chat_session)
+
+    return jsonify({"reply": reply})
 
-    return jsonify({"reply": response.text})
-
-# Initialize the model with tools
-model = genai.GenerativeModel(
-    model_name="gemini-2.5-pro",
-    tools=tools,
-    system_instruction=(
-        "You are a Toyota car purchasing assistant. Your goal is to help users find the perfect Toyota vehicle along with the exact model and year.\n\n"
-        "CONVERSATION FLOW:\n"
-        "1. First, gather essential information by asking questions one at a time:\n"
-        "   - What type of vehicle are they interested in? (sedan, SUV, truck, hybrid, etc.)\n"
-        "   - What is their budget or price range?\n"
-        "   - What year/model preferences do they have?\n"
-        "   - What powertrain do they prefer? (gas, hybrid, electric)\n"
-        "   - Any other specific features or requirements?\n\n"
-        "2. ONLY call the find_cars tool AFTER you have collected:\n"
-        "   - At minimum: vehicle type OR price range\n"
-        "   - Ideally: vehicle type, price range, and powertrain preference\n\n"
-        "3. If the user asks about financing:\n"
-        "   - Ask for their user_id\n"
-        "   - Call get_financial_information to retrieve their financial details\n"
-        "   - Use financialPlan to calculate payment options\n\n"
-        "4. Once a car is selected, offer to find nearby dealerships using find_toyota_dealerships\n\n"
-        "Be conversational, helpful, and patient. Ask follow-up questions to clarify preferences. "
-        "Don't rush to search for cars until you understand what the user needs."
-    )
+SYSTEM_INSTRUCTION = (
+    "You are a Toyota car purchasing assistant. Your goal is to help users find the perfect Toyota vehicle along with the exact model and year.\n\n"
+    "CONVERSATION FLOW:\n"
+    "1. First, gather essential information by asking questions one at a time:\n"
+    "   - What type of vehicle are they interested in? (sedan, SUV, truck, hybrid, etc.)\n"
+    "   - What is their budget or price range?\n"
+    "   - What year/model preferences do they have?\n"
+    "   - What powertrain do they prefer? (gas, hybrid, electric)\n"
+    "   - Any other specific features or requirements?\n\n"
+    "2. ONLY call the find_cars tool AFTER you have collected:\n"
+    "   - At minimum: vehicle type OR price range\n"
+    "   - Ideally: vehicle type, price range, and powertrain preference\n\n"
+    "3. If the user asks about financing:\n"
+    "   - Ask for their user_id\n"
+    "   - Call get_financial_information to retrieve their financial details\n"
+    "   - Use financialPlan to calculate payment options, or financialQuotes to compare several cars and terms at once\n\n"
+    "4. Once a car is selected, offer to find nearby dealerships using find_toyota_dealerships\n\n"
+    "Be conversational, helpful, and patient. Ask follow-up questions to clarify preferences. "
+    "Don't rush to search for cars until you understand what the user needs."
 )
 
-# Start a chat session
-chat = model.start_chat(history=[])
+MODEL_NAME = "gemini-2.5-pro"
 
-print("Toyota Car Purchasing Assistant")
-print("=" * 50)
-print("Hello! I'm here to help you find the perfect Toyota. Type 'exit' to quit.\n")
+# Cached replies are only valid for the prompt, model and tool set that produced them
+RESPONSE_CACHE_NAMESPACE = hashlib.sha1(
+    json.dumps([MODEL_NAME, SYSTEM_INSTRUCTION, tools], sort_keys=True).encode("utf-8")
+).hexdigest()
 
-# Initial greeting from assistant
-try:
-    response = chat.send_message("I want to buy a new Toyota.")
-    print(f"[Assistant]: {response.text}\n")
-except Exception as e:
-    print(f"Error: {e}")
+_model = None
+_model_lock = threading.Lock()
 
-# Main conversation loop
-while True:
-    try:
-        # Get user input
-        user_input = input("[You]: ").strip()
-        
-        if user_input.lower() in ["exit", "quit", "bye"]:
-            print("\n[Assistant]: Thank you for using the Toyota purchasing assistant. Good luck with your car search!")
-            break
-        
-        if not user_input:
-            continue
-        
-        # Send message to Gemini
-        response = chat.send_message(user_input)
-        
-        # Handle function calls
-        while response.candidates[0].content.parts:
-            part = response.candidates[0].content.parts[0]
-            
-            # Check if it's a function call
-            if hasattr(part, 'function_call') and part.function_call:
-                function_call = part.function_call
-                tool_name = function_call.name
-                args = dict(function_call.args)
-                
-                print(f"\n[Tool Call]: {tool_name}")
-                print(f"[Arguments]: {json.dumps(args, indent=2)}")
-                
-                # Execute the tool
-                result = call_tool(tool_name, args)
-                print(f"[Tool Result]: {json.dumps(result, indent=2)}\n")
-                
-                # Send tool result back to Gemini
-                response = chat.send_message(
-                    genai.protos.Content(
-                        parts=[genai.protos.Part(
-                            function_response=genai.protos.FunctionResponse(
-                                name=tool_name,
-                                response={"result": result}
-                            )
-                        )]
-                    )
+
+def get_model():
+    """Configures Gemini and builds the tool-enabled model on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                _model = genai.GenerativeModel(
+                    model_name=MODEL_NAME,
+                    tools=tools,
+                    system_instruction=SYSTEM_INSTRUCTION
                 )
-            else:
-                # It's a text response
-                if response.text:
-                    print(f"\n[Assistant]: {response.text}\n")
-                break
-    
-    except KeyboardInterrupt:
-        print("\n\n[Assistant]: Goodbye!")
-        break
-    except Exception as e:
-        print(f"\n[Error]: {str(e)}\n")
-        continue
+    return _model
+
+
+WARM_UP_STEPS = (
+    ("model", get_model),
+    ("catalog", lambda: get_catalog(get_firestore_client())),
+    ("session_store", get_session_store),
+)
+_warm_up_status = {name: "pending" for name, _ in WARM_UP_STEPS}
+
+
+def warm_up():
+    """
+    Explicit warm-up phase: builds the Gemini model, the Firestore client,
+    the car catalog and the session store before the first request. Each
+    step's outcome is kept for readiness(); the first failure is re-raised.
+    """
+    for name, step in WARM_UP_STEPS:
+        try:
+            step()
+        except Exception as e:
+            _warm_up_status[name] = f"failed: {e}"
+            raise
+        _warm_up_status[name] = "ready"
+
+
+def readiness() -> dict:
+    """Warm-up state of this process; never triggers initialization itself."""
+    status = {"ready": all(v == "ready" for v in _warm_up_status.values()),
+              "pid": os.getpid(), "components": dict(_warm_up_status)}
+    if _warm_up_status["catalog"] == "ready":
+        catalog = get_catalog(None)  # already loaded, no I/O
+        status["catalog"] = {"backend": type(catalog).__name__, "cars": len(catalog)}
+    return status
+
+
+def shut_down():
+    """Releases per-process resources (Firestore listener, prefetch threads) on exit."""
+    _warm_up_status.update((name, "stopped") for name in _warm_up_status)
+    get_prefetcher().close()
+    close_catalog()
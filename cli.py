@@ -0,0 +1,97 @@
+import argparse
+import json
+import google.generativeai as genai
+from chat import get_model, call_tool
+
+
+def list_models():
+    for m in genai.list_models():
+        if 'generateContent' in m.supported_generation_methods:
+            print(m.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Toyota car purchasing assistant (terminal)")
+    parser.add_argument("--list-models", action="store_true",
+                        help="print the Gemini models that support generateContent and exit")
+    args = parser.parse_args()
+
+    model = get_model()
+    if args.list_models:
+        list_models()
+        return
+
+    # Start a chat session
+    chat = model.start_chat(history=[])
+
+    print("Toyota Car Purchasing Assistant")
+    print("=" * 50)
+    print("Hello! I'm here to help you find the perfect Toyota. Type 'exit' to quit.\n")
+
+    # Initial greeting from assistant
+    try:
+        response = chat.send_message("I want to buy a new Toyota.")
+        print(f"[Assistant]: {response.text}\n")
+    except Exception as e:
+        print(f"Error: {e}")
+
+    # Main conversation loop
+    while True:
+        try:
+            # Get user input
+            user_input = input("[You]: ").strip()
+
+            if user_input.lower() in ["exit", "quit", "bye"]:
+                print("\n[Assistant]: Thank you for using the Toyota purchasing assistant. Good luck with your car search!")
+                break
+
+            if not user_input:
+                continue
+
+            # Send message to Gemini
+            response = chat.send_message(user_input)
+
+            # Handle function calls
+            while response.candidates[0].content.parts:
+                part = response.candidates[0].content.parts[0]
+
+                # Check if it's a function call
+                if hasattr(part, 'function_call') and part.function_call:
+                    function_call = part.function_call
+                    tool_name = function_call.name
+                    args = dict(function_call.args)
+
+                    print(f"\n[Tool Call]: {tool_name}")
+                    print(f"[Arguments]: {json.dumps(args, indent=2)}")
+
+                    # Execute the tool
+                    result = call_tool(tool_name, args)
+                    print(f"[Tool Result]: {json.dumps(result, indent=2)}\n")
+
+                    # Send tool result back to Gemini
+                    response = chat.send_message(
+                        genai.protos.Content(
+                            parts=[genai.protos.Part(
+                                function_response=genai.protos.FunctionResponse(
+                                    name=tool_name,
+                                    response={"result": result}
+                                )
+                            )]
+                        )
+                    )
+                else:
+                    # It's a text response
+                    if response.text:
+                        print(f"\n[Assistant]: {response.text}\n")
+                    break
+
+        except KeyboardInterrupt:
+            print("\n\n[Assistant]: Goodbye!")
+            break
+        except Exception as e:
+            print(f"\n[Error]: {str(e)}\n")
+            continue
+
+
+if __name__ == "__main__":
+    main()
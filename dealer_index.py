@@ -0,0 +1,300 @@
+# dealer_index.py
+import argparse
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from dotenv import load_dotenv
+
+from geo_cache import get_geo_cache, geohash_encode, geohash_center
+from http_client import maps_get
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, threads are still serialized
+    fcntl = None
+
+load_dotenv()
+
+MAP_API_KEY = os.getenv("MAP_API")
+MAPS_API_BASE = os.getenv("MAPS_API_BASE", "https://maps.googleapis.com/maps/api").rstrip("/")
+DEALER_INDEX_PATH = os.getenv("DEALER_INDEX_PATH", "dealerships.json")
+DEALER_SEED_RADIUS = 50000  # Places Nearby Search maximum, in meters
+GRID_DEGREES = 0.5
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat, lng, lats, lngs):
+    """Vectorized great-circle distance in meters from (lat, lng) to arrays of points."""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _cell(lat, lng):
+    return int(math.floor(lat / GRID_DEGREES)), int(math.floor(lng / GRID_DEGREES))
+
+
+class DealershipIndex:
+    """
+    Local Toyota dealership dataset with a lat/lng grid index.
+
+    The dataset is seeded from Places Nearby Search results and remembers
+    which circles ("coverage") were searched. A query circle inside a
+    covered circle is answered locally, sorted by distance.
+    """
+
+    def __init__(self, path=DEALER_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dealers = {}  # place_id -> dealership dict
+        self._coverage = []  # [lat, lng, radius_m, fetched_at]
+        self._load()
+        self._rebuild()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        self._dealers = {d["place_id"]: d for d in data.get("dealerships", [])}
+        self._coverage = data.get("coverage", [])
+
+    @contextmanager
+    def _file_lock(self):
+        """Serializes read-modify-write of the file across worker processes."""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self):
+        """Writes the dataset atomically; callers hold self._lock and the file lock."""
+        data = {"dealerships": list(self._dealers.values()), "coverage": self._coverage}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                        prefix=f"{os.path.basename(self.path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _rebuild(self):
+        dealers = [d for d in self._dealers.values() if d.get("location")]
+        lats = np.array([d["location"]["lat"] for d in dealers], dtype=float)
+        lngs = np.array([d["location"]["lng"] for d in dealers], dtype=float)
+        grid = {}
+        for i, (lat, lng) in enumerate(zip(lats, lngs)):
+            grid.setdefault(_cell(lat, lng), []).append(i)
+        # Swap in one assignment so readers never see a half-built index
+        self._arrays = (dealers, lats, lngs, {k: np.array(v) for k, v in grid.items()})
+
+    def add_search(self, lat, lng, radius, dealerships, complete=True):
+        """
+        Merges one Nearby Search result set. Only a search that was not
+        truncated (complete) records its coverage circle and drops the
+        dealers inside it that it no longer returns; a truncated one may
+        have missed dealers, so covers() must not answer from it. The file
+        is reloaded first, so searches saved by other workers are kept.
+        """
+        with self._lock, self._file_lock():
+            self._load()
+            self._rebuild()
+            found = {d["place_id"] for d in dealerships if d.get("place_id")}
+            known, lats, lngs, _ = self._arrays
+            if complete and known:
+                inside = haversine_m(lat, lng, lats, lngs) <= radius
+                for dealer, is_inside in zip(known, inside):
+                    if is_inside and dealer["place_id"] not in found:
+                        del self._dealers[dealer["place_id"]]
+            for d in dealerships:
+                if d.get("place_id"):
+                    self._dealers[d["place_id"]] = d
+            self._coverage = [
+                c for c in self._coverage if (c[0], c[1], c[2]) != (lat, lng, radius)
+            ]
+            if complete:
+                self._coverage.append([lat, lng, radius, time.time()])
+            self._save()
+            self._rebuild()
+
+    def covers(self, lat, lng, radius) -> bool:
+        """True when a previously searched circle fully contains this one."""
+        with self._lock:
+            coverage = np.array(self._coverage, dtype=float).reshape(-1, 4)
+        if not len(coverage):
+            return False
+        distances = haversine_m(lat, lng, coverage[:, 0], coverage[:, 1])
+        return bool(np.any(distances + radius <= coverage[:, 2]))
+
+    def _candidates(self, lat, lng, radius):
+        dealers, lats, lngs, grid = self._arrays
+        lat_span = radius / 111320.0
+        lng_span = radius / (111320.0 * max(math.cos(math.radians(lat)), 0.01))
+        low, high = _cell(lat - lat_span, lng - lng_span), _cell(lat + lat_span, lng + lng_span)
+        cells = [
+            grid[(i, j)]
+            for i in range(low[0], high[0] + 1)
+            for j in range(low[1], high[1] + 1)
+            if (i, j) in grid
+        ]
+        indices = np.concatenate(cells) if cells else np.array([], dtype=int)
+        return dealers, lats, lngs, indices
+
+    def _results(self, dealers, indices, distances):
+        return [dict(dealers[i], distance_m=round(float(d), 1)) for i, d in zip(indices, distances)]
+
+    def query_radius(self, lat, lng, radius) -> list:
+        """Dealerships within radius meters, nearest first."""
+        dealers, lats, lngs, indices = self._candidates(lat, lng, radius)
+        distances = haversine_m(lat, lng, lats[indices], lngs[indices])
+        inside = distances <= radius
+        indices, distances = indices[inside], distances[inside]
+        order = np.argsort(distances)
+        return self._results(dealers, indices[order], distances[order])
+
+    def nearest(self, lat, lng, k=5) -> list:
+        """The k closest dealerships in the dataset, nearest first."""
+        dealers, lats, lngs, _ = self._arrays
+        if not dealers:
+            return []
+        distances = haversine_m(lat, lng, lats, lngs)
+        k = min(k, len(dealers))
+        indices = np.argpartition(distances, k - 1)[:k]
+        indices = indices[np.argsort(distances[indices])]
+        return self._results(dealers, indices, distances[indices])
+
+    def coverage(self) -> list:
+        with self._lock:
+            return list(self._coverage)
+
+    def __len__(self):
+        return len(self._dealers)
+
+
+_dealer_index = None
+_dealer_index_lock = threading.Lock()
+
+
+def get_dealer_index() -> DealershipIndex:
+    """Returns the process-wide dealership index (singleton)."""
+    global _dealer_index
+    if _dealer_index is None:
+        with _dealer_index_lock:
+            if _dealer_index is None:
+                _dealer_index = DealershipIndex()
+    return _dealer_index
+
+
+def geocode_address(address: str):
+    """Returns (lat, lng) for an address via the geocode cache, or None."""
+    cache = get_geo_cache()
+    cached_location = cache.get_geocode(address)
+    if cached_location is not None:
+        return cached_location
+
+    geocode_url = f"{MAPS_API_BASE}/geocode/json?address={address}&key={MAP_API_KEY}"
+    geocode_response = maps_get("geocoding", geocode_url)
+    if geocode_response.get("status") != "OK":
+        return None
+
+    loc = geocode_response["results"][0]["geometry"]["location"]
+    cache.put_geocode(address, loc["lat"], loc["lng"])
+    return loc["lat"], loc["lng"]
+
+
+def seed_dealerships(lat: float, lng: float, refresh: bool = False):
+    """
+    Adds every Toyota dealership within DEALER_SEED_RADIUS of the geohash cell
+    centre around (lat, lng) to the local index (up to 3 result pages). A
+    failed first page raises; a failed later page keeps the pages already
+    fetched but leaves the search uncached and incomplete, so it is retried.
+    """
+    cache = get_geo_cache()
+    cell = geohash_encode(lat, lng)
+    cell_lat, cell_lng = geohash_center(cell)
+    dealerships = None if refresh else cache.get_places(cell, DEALER_SEED_RADIUS)
+    complete = True
+
+    if dealerships is None:
+        dealerships = []
+        failed = False
+        place_url = (
+            f"{MAPS_API_BASE}/place/nearbysearch/json?"
+            f"location={cell_lat},{cell_lng}&radius={DEALER_SEED_RADIUS}&type=car_dealer&keyword=Toyota dealership&key={MAP_API_KEY}"
+        )
+        for page in range(3):
+            place_response = maps_get("places", place_url)
+            status = place_response.get("status")
+            if status not in ("OK", "ZERO_RESULTS"):
+                if page == 0:
+                    raise RuntimeError(f"Places search failed: {status}")
+                print(f"Places page {page + 1} failed ({status}); keeping {len(dealerships)} dealerships")
+                failed, complete = True, False
+                break
+            dealerships.extend(
+                {
+                    "name": p.get("name"),
+                    "address": p.get("vicinity"),
+                    "rating": p.get("rating"),
+                    "place_id": p.get("place_id"),
+                    "location": p.get("geometry", {}).get("location", {})
+                }
+                for p in place_response.get("results", [])
+            )
+            token = place_response.get("next_page_token")
+            complete = token is None
+            if complete or page == 2:
+                break
+            time.sleep(2)  # page tokens take a moment to become valid
+            place_url = (
+                f"{MAPS_API_BASE}/place/nearbysearch/json?"
+                f"pagetoken={token}&key={MAP_API_KEY}"
+            )
+        if not failed:
+            cache.put_places(cell, DEALER_SEED_RADIUS, dealerships)
+    else:
+        complete = len(dealerships) < 60  # Nearby Search stops at 3 pages of 20
+
+    get_dealer_index().add_search(cell_lat, cell_lng, DEALER_SEED_RADIUS, dealerships, complete=complete)
+
+
+def main():
+    """Offline maintenance: seed new areas or refresh every covered area."""
+    parser = argparse.ArgumentParser(description="Seed or refresh the local dealership index")
+    parser.add_argument("--seed", nargs="*", default=[], metavar="ADDRESS",
+                        help="addresses whose surroundings should be added")
+    parser.add_argument("--refresh", action="store_true",
+                        help="re-run the Places search for every covered area")
+    args = parser.parse_args()
+
+    index = get_dealer_index()
+    for address in args.seed:
+        location = geocode_address(address)
+        if location is None:
+            print(f"Geocoding failed for {address}")
+            continue
+        seed_dealerships(*location, refresh=True)
+    if args.refresh:
+        for lat, lng, _, _ in index.coverage():
+            seed_dealerships(lat, lng, refresh=True)
+    print(f"{len(index)} dealerships, {len(index.coverage())} covered areas")
+
+
+if __name__ == "__main__":
+    main()
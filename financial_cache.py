@@ -0,0 +1,121 @@
+# financial_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from metrics import span, FIRESTORE_SECONDS
+
+FINANCIAL_CACHE_TTL = float(os.getenv("FINANCIAL_CACHE_TTL", "600"))
+FINANCIAL_CACHE_SIZE = int(os.getenv("FINANCIAL_CACHE_SIZE", "1024"))
+
+
+def _profile_from_doc(user_id, data):
+    return {
+        "annual_income": data.get("annualIncome"),
+        "debt_to_income_ratio": data.get("debtToIncomeRatio"),
+        "credit_score": data.get("creditScore"),
+        "user_id": user_id
+    }
+
+
+class FinancialProfileCache:
+    """
+    TTL + LRU cache of users/{user_id}/financial/data profiles.
+
+    Every cached user gets a document on_snapshot listener; when the
+    frontend's saveFinancialData rewrites the doc the entry is evicted, so
+    the next read sees the new numbers.
+    """
+
+    def __init__(self, ttl=FINANCIAL_CACHE_TTL, max_size=FINANCIAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (profile, expires_at, update_time, watch)
+
+    def get(self, db, user_id: str) -> dict:
+        """Returns the cached profile for user_id, reading Firestore on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return dict(entry[0])
+            self.misses += 1
+        if entry is not None:
+            self.evict(user_id)
+
+        doc_ref = db.collection('users').document(user_id).collection('financial').document('data')
+        with span(FIRESTORE_SECONDS, op="financial_profile"):
+            snapshot = doc_ref.get()
+        if not snapshot.exists:
+            return {}
+        profile = _profile_from_doc(user_id, snapshot.to_dict())
+        self._put(user_id, profile, snapshot.update_time, doc_ref)
+        return dict(profile)
+
+    def _put(self, user_id, profile, update_time, doc_ref):
+        watch = doc_ref.on_snapshot(
+            lambda docs, changes, read_time: self._on_snapshot(user_id, docs)
+        )
+        with self._lock:
+            old = self._entries.pop(user_id, None)
+            self._entries[user_id] = (profile, time.monotonic() + self.ttl, update_time, watch)
+            overflow = []
+            while len(self._entries) > self.max_size:
+                overflow.append(self._entries.popitem(last=False))
+                self.evictions += 1
+        if old is not None:
+            old[3].unsubscribe()
+        for _, (_, _, _, stale_watch) in overflow:
+            stale_watch.unsubscribe()
+
+    def _on_snapshot(self, user_id, docs):
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        snapshot = docs[0] if docs else None
+        # The first snapshot mirrors the doc we just cached; only evict on edits.
+        if snapshot is None or not snapshot.exists or snapshot.update_time != entry[2]:
+            # Unsubscribing joins the listener thread, so not from inside it.
+            self.evict(user_id, background=True)
+
+    def evict(self, user_id: str, background=False):
+        """Drops user_id from the cache and stops listening to its doc."""
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self.evictions += 1
+        if entry is None:
+            return
+        if background:
+            threading.Thread(target=entry[3].unsubscribe, daemon=True).start()
+        else:
+            entry[3].unsubscribe()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+_financial_cache = FinancialProfileCache()
+
+
+def get_financial_cache() -> FinancialProfileCache:
+    """Returns the process-wide financial profile cache."""
+    return _financial_cache
@@ -0,0 +1,61 @@
+# financing.py
+import numpy as np
+
+LEASE_RESIDUAL_RATE = 0.55  # assume 55% residual value
+
+# (min score, max score exclusive, APR) -- same tiers as getInterestRate
+APR_TIERS = (
+    (760, 851, 0.0499),
+    (700, 760, 0.0599),
+    (650, 700, 0.0699),
+    (600, 650, 0.0899),
+    (300, 600, 0.1199),
+)
+
+
+def interest_rates(credit_scores) -> np.ndarray:
+    """Vectorized getInterestRate: APR for each credit score (NaN when out of range)."""
+    scores = np.asarray(credit_scores, dtype=float)
+    conditions = [(scores >= low) & (scores < high) for low, high, _ in APR_TIERS]
+    return np.select(conditions, [apr for _, _, apr in APR_TIERS], default=np.nan)
+
+
+def _grid(prices, down_payments, terms, aprs):
+    """Broadcasts the four inputs to a (price, down, term, apr) grid."""
+    price = np.asarray(prices, dtype=float).reshape(-1, 1, 1, 1)
+    down = np.asarray(down_payments, dtype=float).reshape(1, -1, 1, 1)
+    term = np.asarray(terms, dtype=float).reshape(1, 1, -1, 1)
+    apr = np.asarray(aprs, dtype=float).reshape(1, 1, 1, -1)
+    return price, down, term, apr
+
+
+def finance_quotes(prices, down_payments, terms, aprs) -> dict:
+    """
+    Amortized loan payments for every price x down payment x term x APR.
+    Returns {"monthly", "total"} arrays of shape (P, D, T, A).
+    """
+    price, down, term, apr = _grid(prices, down_payments, terms, aprs)
+    principal = price - down
+    rate = apr / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        monthly = np.where(rate > 0, principal * rate / (1 - (1 + rate) ** -term), principal / term)
+    return {
+        "monthly": np.round(monthly, 2),
+        "total": np.round(monthly * term, 2) + down
+    }
+
+
+def lease_quotes(prices, down_payments, terms, aprs, residual_rate=LEASE_RESIDUAL_RATE) -> dict:
+    """
+    Lease payments (depreciation fee + finance fee) on the same grid as
+    finance_quotes. The money factor is APR / 24.
+    """
+    price, down, term, apr = _grid(prices, down_payments, terms, aprs)
+    cap_cost = price - down  # capitalized cost after down payment
+    residual = price * residual_rate
+    monthly = (cap_cost - residual) / term + (cap_cost + residual) * (apr / 24)
+    return {
+        "monthly": np.round(monthly, 2),
+        "total": np.round(monthly * term, 2) + down,
+        "residual": np.round(np.broadcast_to(residual, monthly.shape), 2)
+    }
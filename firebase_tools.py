@@ -2,20 +2,24 @@
 import firebase_admin
 from firebase_admin import firestore, credentials
 import os
+import numpy as np
 from dotenv import load_dotenv
 from langchain.tools import tool
-import requests
+from catalog import get_catalog
+from financial_cache import get_financial_cache
+from financing import finance_quotes, interest_rates, lease_quotes
+from dealer_index import get_dealer_index, geocode_address, seed_dealerships, DEALER_SEED_RADIUS
+from rate_limit import RateLimited
 
 load_dotenv()
 
 SERVICE_ACCOUNT_KEY_PATH = os.getenv("SERVICE_ACCOUNT_KEY_PATH")
 FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
-MAP_API_KEY = os.getenv("MAP_API")
 
 db_client = None
 
 def initialize_firebase_sdk():
-    """Initializes Firebase app with credentials."""
+    """Initializes Firebase app with credentials; raises RuntimeError when that fails."""
     try:
         firebase_admin.get_app()
     except ValueError:
@@ -24,11 +28,9 @@ def initialize_firebase_sdk():
             firebase_admin.initialize_app(cred, {'projectId': FIREBASE_PROJECT_ID})
             print("Firebase Admin SDK initialized successfully!")
         except FileNotFoundError:
-            print(f"Service account key not found at {SERVICE_ACCOUNT_KEY_PATH}")
-            exit(1)
+            raise RuntimeError(f"Service account key not found at {SERVICE_ACCOUNT_KEY_PATH}")
         except Exception as e:
-            print(f"Error initializing Firebase Admin SDK: {e}")
-            exit(1)
+            raise RuntimeError(f"Error initializing Firebase Admin SDK: {e}") from e
 
 def get_firestore_client():
     """Returns Firestore client (singleton)."""
@@ -39,80 +41,60 @@ def get_firestore_client():
     return db_client
 
 @tool("cars_finder", description="Extracts cars from Firestore database based on user preferences.")
-def find_cars(car_type: str, max_price: int, make_year: str, powertrain: str) -> list:
-    """Query 'cars' collection with criteria."""
+def find_cars(car_type: str = None, max_price: int = None, make_year: str = None,
+              powertrain: str = None, min_range: float = None, select: list = None,
+              sort: str = "price_asc", limit: int = 10, cursor: str = None) -> dict:
+    """Query the in-memory catalog of the 'cars' collection with criteria.
+    Returns one price-ordered page of projected cars, the total match count
+    and a cursor for the next page."""
     try:
-        db = get_firestore_client()
-        query_ref = db.collection('cars')
-
-        if car_type:
-            query_ref = query_ref.where("car_type", "array_contains", car_type)
-        if make_year:
-            query_ref = query_ref.where("make_year", "==", make_year)
-        if powertrain:
-            query_ref = query_ref.where("powertrain", "==", powertrain)
-        if max_price is not None:
-            query_ref = query_ref.where("price", "<=", max_price)
-
-        docs = query_ref.stream()
-        return [dict(doc.to_dict(), id=doc.id) for doc in docs]
+        catalog = get_catalog(get_firestore_client())
+        return catalog.search(car_type=car_type, max_price=max_price,
+                              make_year=make_year, powertrain=powertrain, min_range=min_range,
+                              select=select, descending=(sort == "price_desc"),
+                              limit=limit, cursor=cursor)
 
     except Exception as e:
         print(f"Error finding cars: {e}")
-        return []
+        return {"error": str(e)}
 
-@tool("get_financial_information", description="Gets financial info for a user by user_id.")
-def get_financial_information(user_id: str) -> dict:
-    """Fetch financial info for user from Firestore."""
+def _financial_profile(user_id: str) -> dict:
+    """Returns the cached financial/data profile for user_id."""
     try:
-        db = get_firestore_client()
-        financial_ref = db.collection('users').document(user_id).collection('financial')
-        for doc in financial_ref.stream():
-            data = doc.to_dict()
-            return {
-                "annual_income": data.get("annualIncome"),
-                "debt_to_income_ratio": data.get("debtToIncomeRatio"),
-                "credit_score": data.get("creditScore"),
-                "user_id": user_id
-            }
+        return get_financial_cache().get(get_firestore_client(), user_id)
     except Exception as e:
         print(f"Error fetching financial data: {e}")
     return {}
 
+@tool("get_financial_information", description="Gets financial info for a user by user_id.")
+def get_financial_information(user_id: str) -> dict:
+    """Fetch financial info for user from Firestore (cached)."""
+    return _financial_profile(user_id)
+
 @tool("find_toyota_dealerships", description="Finds nearby Toyota dealerships for a given address.")
 def find_toyota_dealerships(address: str, radius: int = 8000) -> dict:
-    """Uses Google Maps API to locate nearby Toyota dealerships."""
+    """
+    Finds Toyota dealerships near an address, nearest first. Answered from the
+    local dealership index; only areas it has never covered hit the Places API.
+    """
     try:
-        # Geocode address
-        geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={MAP_API_KEY}"
-        geocode_response = requests.get(geocode_url).json()
-        if geocode_response.get("status") != "OK":
+        location = geocode_address(address)
+        if location is None:
             return {"error": "Geocoding failed"}
+        lat, lng = location
+        radius = min(int(radius or 8000), DEALER_SEED_RADIUS)
 
-        loc = geocode_response["results"][0]["geometry"]["location"]
-        lat, lng = loc["lat"], loc["lng"]
-
-        # Nearby Toyota dealerships
-        place_url = (
-            f"https://maps.googleapis.com/maps/api/place/nearbysearch/json?"
-            f"location={lat},{lng}&radius={radius}&type=car_dealer&keyword=Toyota dealership&key={MAP_API_KEY}"
-        )
-        place_response = requests.get(place_url).json()
-        dealerships = [
-            {
-                "name": p.get("name"),
-                "address": p.get("vicinity"),
-                "rating": p.get("rating"),
-                "place_id": p.get("place_id"),
-                "location": p.get("geometry", {}).get("location", {})
-            }
-            for p in place_response.get("results", [])
-        ]
+        index = get_dealer_index()
+        if not index.covers(lat, lng, radius):
+            seed_dealerships(lat, lng)
+        dealerships = index.query_radius(lat, lng, radius)
 
         return {"query_location": {"latitude": lat, "longitude": lng},
                 "dealerships_found": len(dealerships),
                 "dealerships": dealerships}
 
+    except RateLimited:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
@@ -126,16 +108,55 @@ def getInterestRate(creditScore: int) -> float:
     raise ValueError("Invalid credit score")
 
 def financialPlan(typeOfPayment: str, userId: str, *price):
-    """Calculates payments based on financing/cash."""
-    financial_data = get_financial_information(userId)
+    """Calculates payments based on cash, financing or leasing.
+    price = (total price, down payment, term in months)."""
     if "cash" in typeOfPayment.lower():
         return {"Total Payment": price[0]}
-    creditScore = financial_data["credit_score"]
+    apr = getInterestRate(_financial_profile(userId)["credit_score"])
     if "finance" in typeOfPayment.lower():
-        monthlyRate = getInterestRate(creditScore)/12
-        total = round(((price[0]-price[1])*monthlyRate)/(1-(1+monthlyRate)**-price[2])*price[2],2) + price[1]
-        monthlyPayment = round(((price[0]-price[1])*monthlyRate)/(1-(1+monthlyRate)**-price[2]),2)
-        return {"Total Payment": total, "Down Payment": price[1], "Monthly Payment": monthlyPayment}
+        quote = finance_quotes([price[0]], [price[1]], [price[2]], [apr])
+        return {"Total Payment": float(quote["total"].item()), "Down Payment": price[1],
+                "Monthly Payment": float(quote["monthly"].item())}
+    if "lease" in typeOfPayment.lower():
+        quote = lease_quotes([price[0]], [price[1]], [price[2]], [apr])
+        return {"Total Payment": float(quote["total"].item()), "Down Payment": price[1],
+                "Monthly Payment": float(quote["monthly"].item()),
+                "Residual Value": float(quote["residual"].item())}
+
+def financialQuotes(typeOfPayment: str, userId: str, prices: list, downPayments: list,
+                    terms: list = (36, 48, 60, 72), creditScores: list = None) -> dict:
+    """
+    Quotes every price x down payment x term in one vectorized pass, at the
+    user's APR or, given creditScores, at the APR tier of each score.
+    """
+    quote_fn = lease_quotes if "lease" in typeOfPayment.lower() else finance_quotes
+    if creditScores:
+        aprs = interest_rates(creditScores)
+        if np.isnan(aprs).any():
+            raise ValueError("Invalid credit score")
+        quote = quote_fn(prices, downPayments, terms, aprs)
+        return {
+            "credit_scores": list(creditScores),
+            "aprs": aprs.tolist(),
+            "prices": list(prices),
+            "down_payments": list(downPayments),
+            "terms": list(terms),
+            # indexed [price][down payment][term][credit score]
+            "monthly_payments": quote["monthly"].tolist(),
+            "total_payments": quote["total"].tolist()
+        }
+
+    apr = getInterestRate(_financial_profile(userId)["credit_score"])
+    quote = quote_fn(prices, downPayments, terms, [apr])
+    return {
+        "apr": apr,
+        "prices": list(prices),
+        "down_payments": list(downPayments),
+        "terms": list(terms),
+        # indexed [price][down payment][term]
+        "monthly_payments": quote["monthly"][..., 0].tolist(),
+        "total_payments": quote["total"][..., 0].tolist()
+    }
 
 def all_tools():
     """Returns all available tools for LangChain/Gemini agent."""
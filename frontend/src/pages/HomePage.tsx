@@ -240,15 +240,58 @@ export default function HomePage() {
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
       user_id: currentUser.uid,
-      message: userMessage.text
+      message: userMessage.text,
+      stream: true
     })
   });
 
-  const data = await response.json();
+  if (!response.ok || !response.body) {
+    throw new Error(`Chat request failed: ${response.status}`);
+  }
+
+  const aiMessageId = Date.now().toString();
+  let replyText = "";
+  const showReply = (text: string) => {
+    setMessages(prev => {
+      const aiMessage: Message = { id: aiMessageId, text, sender: "ai", timestamp: new Date() };
+      const others = prev.filter(msg => msg.id !== aiMessageId);
+      return [...others, aiMessage];
+    });
+  };
+
+  // Read server-sent events: token, tool, done, error
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const frames = buffer.split("\n\n");
+    buffer = frames.pop() ?? "";
+    for (const frame of frames) {
+      const event = frame.match(/^event: (.*)$/m)?.[1];
+      const data = frame.match(/^data: (.*)$/m)?.[1];
+      if (!event || !data) continue;
+      const payload = JSON.parse(data);
+
+      if (event === "token") {
+        replyText += payload.text;
+        showReply(replyText);
+      } else if (event === "tool" && !replyText) {
+        showReply(payload.status);
+      } else if (event === "done") {
+        replyText = payload.reply;
+      } else if (event === "error") {
+        throw new Error(payload.error);
+      }
+    }
+  }
 
   const aiMessage: Message = {
-    id: Date.now().toString(),
-    text: data.reply,
+    id: aiMessageId,
+    text: replyText,
     sender: "ai",
     timestamp: new Date()
   };
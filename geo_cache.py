@@ -0,0 +1,135 @@
+# geo_cache.py
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+GEO_CACHE_PATH = os.getenv("GEO_CACHE_PATH", "geo_cache.sqlite3")
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+PLACES_CACHE_TTL = float(os.getenv("PLACES_CACHE_TTL", str(24 * 3600)))
+GEOHASH_PRECISION = int(os.getenv("GEOHASH_PRECISION", "6"))
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encodes a coordinate as a geohash cell of the given length."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def geohash_center(cell: str) -> tuple:
+    """Returns the (lat, lng) centre of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        bits = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (bits >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def normalize_address(address: str) -> str:
+    """Lower-cases and strips punctuation so '75080' and ' 75080, ' share a key."""
+    address = re.sub(r"[^\w\s]", " ", address.lower())
+    return " ".join(address.split())
+
+
+class GeoCache:
+    """
+    Two-level SQLite cache for the dealership tool.
+
+    Level 1 maps normalized addresses to lat/lng (Geocoding API).
+    Level 2 maps (geohash cell, radius) to Nearby Search results (Places API).
+    Each level has its own TTL and the file survives restarts.
+    """
+
+    def __init__(self, path=GEO_CACHE_PATH, geocode_ttl=GEOCODE_CACHE_TTL,
+                 places_ttl=PLACES_CACHE_TTL):
+        self.geocode_ttl = geocode_ttl
+        self.places_ttl = places_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                "address TEXT PRIMARY KEY, lat REAL, lng REAL, created_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS places ("
+                "cell TEXT, radius INTEGER, results TEXT, created_at REAL, "
+                "PRIMARY KEY (cell, radius))"
+            )
+
+    def get_geocode(self, address: str):
+        """Returns cached (lat, lng) for address, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lat, lng, created_at FROM geocode WHERE address = ?",
+                (normalize_address(address),)
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.geocode_ttl:
+            return None
+        return row[0], row[1]
+
+    def put_geocode(self, address: str, lat: float, lng: float):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?)",
+                (normalize_address(address), lat, lng, time.time())
+            )
+
+    def get_places(self, cell: str, radius: int):
+        """Returns cached dealership results for a cell and radius, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, created_at FROM places WHERE cell = ? AND radius = ?",
+                (cell, int(radius))
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.places_ttl:
+            return None
+        return json.loads(row[0])
+
+    def put_places(self, cell: str, radius: int, results: list):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?)",
+                (cell, int(radius), json.dumps(results), time.time())
+            )
+
+
+_geo_cache = None
+_geo_cache_lock = threading.Lock()
+
+
+def get_geo_cache() -> GeoCache:
+    """Returns the process-wide geo cache (singleton)."""
+    global _geo_cache
+    if _geo_cache is None:
+        with _geo_cache_lock:
+            if _geo_cache is None:
+                _geo_cache = GeoCache()
+    return _geo_cache
@@ -0,0 +1,151 @@
+# http_client.py
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import HTTP_SECONDS
+from rate_limit import get_limiter, parse_retry_after
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.3"))
+HTTP_BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.3"))
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Calls made under a rate_limit limiter must see a 429 at once, so limiter.throttled() backs off
+# instead of the session sleeping out Retry-After while holding the limiter slot. urllib3
+# retries any 429 carrying Retry-After when it respects that header, so those sessions don't.
+LIMITED_RETRY_STATUSES = (500, 502, 503, 504)
+
+_sessions = {}
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_host_stats = {}
+
+
+def _build_session(statuses, respect_retry_after=True) -> requests.Session:
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        connect=HTTP_MAX_RETRIES,
+        read=HTTP_MAX_RETRIES,
+        status=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        backoff_jitter=HTTP_BACKOFF_JITTER,
+        status_forcelist=statuses,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=respect_retry_after,
+        raise_on_status=False
+    )
+    # pool_maxsize is the keep-alive connection limit per host
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        pool_block=True,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(limited=False) -> requests.Session:
+    """Returns the shared keep-alive session; limited=True gives the one that does not retry 429s."""
+    session = _sessions.get(limited)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(limited)
+            if session is None:
+                if limited:
+                    session = _build_session(LIMITED_RETRY_STATUSES, respect_retry_after=False)
+                else:
+                    session = _build_session(RETRY_STATUSES)
+                _sessions[limited] = session
+    return session
+
+
+def _record(host, elapsed, retries, failed):
+    HTTP_SECONDS.observe(elapsed, host=host)
+    with _stats_lock:
+        stats = _host_stats.setdefault(host, {
+            "requests": 0, "errors": 0, "retries": 0,
+            "total_seconds": 0.0, "max_seconds": 0.0
+        })
+        stats["requests"] += 1
+        stats["retries"] += retries
+        stats["errors"] += int(failed)
+        stats["total_seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+
+def request(method: str, url: str, timeout=None, limited=False, **kwargs) -> requests.Response:
+    """
+    Sends a request through the shared session with default timeouts and
+    retries. Pass limited=True for calls made under a rate_limit limiter:
+    their 429 comes back unretried.
+    """
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    host = urlsplit(url).netloc
+    start = time.perf_counter()
+    try:
+        response = get_session(limited).request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException:
+        _record(host, time.perf_counter() - start, 0, True)
+        raise
+    history = getattr(getattr(response.raw, "retries", None), "history", ()) or ()
+    _record(host, time.perf_counter() - start, len(history), response.status_code >= 400)
+    return response
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Drop-in replacement for requests.get."""
+    return request("GET", url, **kwargs)
+
+
+def maps_get(upstream: str, url: str) -> dict:
+    """
+    GET a Google Maps API url as JSON under the upstream's rate_limit
+    limiter. A 429 or OVER_QUERY_LIMIT pauses the limiter and raises
+    RateLimited.
+    """
+    limiter = get_limiter(upstream)
+    with limiter.acquire():
+        response = get(url, limited=True)
+    if response.status_code == 429:
+        raise limiter.throttled(parse_retry_after(response.headers.get("Retry-After")))
+    data = response.json()
+    if data.get("status") == "OVER_QUERY_LIMIT":
+        raise limiter.throttled()
+    return data
+
+
+def stats() -> dict:
+    """Per-host latency counters and keep-alive pool occupancy."""
+    with _stats_lock:
+        hosts = {}
+        for host, s in _host_stats.items():
+            hosts[host] = dict(s, avg_seconds=round(s["total_seconds"] / s["requests"], 4))
+
+    pools = {}
+    for session in list(_sessions.values()):
+        pool_manager = session.get_adapter("https://").poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            pools[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle_connections": sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                                    if pool.pool else 0,
+                "max_size": pool.pool.maxsize if pool.pool else 0
+            }
+    return {"hosts": hosts, "pools": pools}
@@ -1,34 +1,49 @@
-import requests
+import http_client
 from dotenv import load_dotenv
 import os
+from geo_cache import get_geo_cache, geohash_encode, geohash_center
 
 load_dotenv()
 
 address = input("Enter your address: ")
 api_key = os.getenv("MAP_API")
-
-url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={api_key}"
-response = requests.get(url).json()
-
-if response['status'] == 'OK':
-    location = response['results'][0]['geometry']['location']
-    lat, lng = location['lat'], location['lng']
-    print(lat, lng)
-
-place_url = (
-    "https://maps.googleapis.com/maps/api/place/nearbysearch/json?"
-    f"location={lat},{lng}&radius=5000&type=car_dealer&keyword=Toyota dealership&key={api_key}"
-)
-
-place_response = requests.get(place_url).json()
-
-dealerships = []
-for place in place_response.get('results', []):
-    dealerships.append({
-        'name': place['name'],
-        'address': place.get('vicinity'),
-        'rating': place.get('rating'),
-        'place_id': place.get('place_id')
-    })
-
-print(dealerships)
\ No newline at end of file
+cache = get_geo_cache()
+radius = 5000
+
+location = cache.get_geocode(address)
+if location is None:
+    url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={api_key}"
+    response = http_client.get(url).json()
+
+    if response['status'] == 'OK':
+        location = response['results'][0]['geometry']['location']
+        location = location['lat'], location['lng']
+        cache.put_geocode(address, *location)
+
+lat, lng = location
+print(lat, lng)
+
+cell = geohash_encode(lat, lng)
+dealerships = cache.get_places(cell, radius)
+if dealerships is None:
+    cell_lat, cell_lng = geohash_center(cell)
+    place_url = (
+        "https://maps.googleapis.com/maps/api/place/nearbysearch/json?"
+        f"location={cell_lat},{cell_lng}&radius={radius}&type=car_dealer&keyword=Toyota dealership&key={api_key}"
+    )
+
+    place_response = http_client.get(place_url).json()
+
+    dealerships = []
+    for place in place_response.get('results', []):
+        dealerships.append({
+            'name': place['name'],
+            'address': place.get('vicinity'),
+            'rating': place.get('rating'),
+            'place_id': place.get('place_id'),
+            'location': place.get('geometry', {}).get('location', {})
+        })
+    if place_response.get('status') in ('OK', 'ZERO_RESULTS'):
+        cache.put_places(cell, radius, dealerships)
+
+print(dealerships)
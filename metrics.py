@@ -0,0 +1,269 @@
+# metrics.py
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+_registry = {}
+_registry_lock = threading.Lock()
+_multiprocess_dir = None
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, samples, other):
+        """Adds another process's samples (counters sum across workers)."""
+        for key, value in other.items():
+            samples[key] = samples.get(key, 0) + value
+
+    def render(self, samples=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted((self.samples() if samples is None else samples).items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def set(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, samples, other):
+        """Adds a live process's samples (queue depth and in-flight calls sum across workers)."""
+        for key, value in other.items():
+            samples[key] = samples.get(key, 0) + value
+
+    def render(self, samples=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted((self.samples() if samples is None else samples).items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> dict:
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def merge(self, samples, other):
+        """Adds another process's series bucket by bucket."""
+        for key, series in other.items():
+            if key in samples:
+                samples[key] = [a + b for a, b in zip(samples[key], series)]
+            else:
+                samples[key] = list(series)
+
+    def render(self, samples=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted((self.samples() if samples is None else samples).items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+def _register(metric):
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def counter(name, help_text) -> Counter:
+    """Returns the named counter, creating it on first use."""
+    return _register(Counter(name, help_text))
+
+
+def gauge(name, help_text) -> Gauge:
+    """Returns the named gauge, creating it on first use."""
+    return _register(Gauge(name, help_text))
+
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS) -> Histogram:
+    """Returns the named histogram, creating it on first use."""
+    return _register(Histogram(name, help_text, buckets))
+
+
+@contextmanager
+def span(metric: Histogram, **labels):
+    """Times the enclosed block into a latency histogram (errors included)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start, **labels)
+
+
+def enable_multiprocess(path):
+    """
+    Aggregates metrics across pre-forked workers (serve.py). Called once in
+    the master before forking: clears path, then every worker flushes its
+    samples to path/<pid>.json (start_flusher) and render() sums all of
+    them, so counters stay monotonic whichever worker answers a scrape.
+    Files of exited workers are kept for their counters and histograms;
+    their gauges are dropped.
+    """
+    global _multiprocess_dir
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.json")):
+        os.remove(stale)
+    _multiprocess_dir = path
+
+
+def flush():
+    """Writes this process's samples to the multiprocess directory (no-op when disabled)."""
+    if _multiprocess_dir is None:
+        return
+    with _registry_lock:
+        metrics = list(_registry.values())
+    data = {"pid": os.getpid(), "metrics": {
+        metric.name: [[list(map(list, key)), value] for key, value in metric.samples().items()]
+        for metric in metrics
+    }}
+    path = os.path.join(_multiprocess_dir, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def start_flusher(interval=METRICS_FLUSH_INTERVAL):
+    """Flushes every interval seconds on a daemon thread; run once per worker after the fork."""
+    if _multiprocess_dir is None:
+        return
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                flush()
+            except OSError as e:
+                print(f"[Metrics] Flush failed: {e}")
+
+    threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _other_processes():
+    """(pid, {metric name: samples}) for every other worker's last flush."""
+    for path in glob.glob(os.path.join(_multiprocess_dir, "*.json")):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if data["pid"] == os.getpid():
+            continue
+        yield data["pid"], {
+            name: {tuple(map(tuple, key)): value for key, value in samples}
+            for name, samples in data["metrics"].items()
+        }
+
+
+def render() -> str:
+    """
+    Prometheus text exposition of every registered metric, summed over all
+    workers when enable_multiprocess is on (other workers as of their last
+    flush).
+    """
+    with _registry_lock:
+        metrics = list(_registry.values())
+    merged = {metric.name: metric.samples() for metric in metrics}
+    if _multiprocess_dir is not None:
+        for pid, samples in _other_processes():
+            alive = _pid_alive(pid)
+            for metric in metrics:
+                if metric.name in samples and (alive or not isinstance(metric, Gauge)):
+                    metric.merge(merged[metric.name], samples[metric.name])
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render(merged[metric.name]))
+    return "\n".join(lines) + "\n"
+
+
+LLM_SECONDS = histogram("llm_request_seconds", "Gemini request latency, per call")
+CHAT_TURN_SECONDS = histogram("chat_turn_seconds", "End-to-end /api/chat turn latency")
+TURN_PROMPT_TOKENS = histogram("chat_turn_prompt_tokens", "Prompt tokens sent per chat turn", TOKEN_BUCKETS)
+TURN_RESPONSE_TOKENS = histogram("chat_turn_response_tokens", "Response tokens generated per chat turn", TOKEN_BUCKETS)
+LLM_TOKENS = counter("llm_tokens_total", "Gemini tokens by kind")
+TOOL_CALLS = counter("tool_calls_total", "Tool calls by dispatcher outcome (hit, shared, executed)")
+TOOL_SECONDS = histogram("tool_execution_seconds", "Tool execution latency (cache misses only)")
+FIRESTORE_SECONDS = histogram("firestore_query_seconds", "Firestore read latency")
+HTTP_SECONDS = histogram("http_request_seconds", "Outbound HTTP latency, retries included")
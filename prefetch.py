@@ -0,0 +1,202 @@
+# prefetch.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from geo_cache import normalize_address
+from metrics import counter, histogram, span, FIRESTORE_SECONDS
+
+PREFETCH_POLICIES = os.getenv("PREFETCH_POLICIES", "financial,location")
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "600"))
+PREFETCH_WAIT = float(os.getenv("PREFETCH_WAIT", "2.0"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+# users/{id} fields checked, in order, for a saved location
+PROFILE_ADDRESS_FIELDS = ("address", "homeAddress", "zipCode", "zip", "city")
+DEALER_PREFETCH_RADIUS = 8000  # find_toyota_dealerships' default radius
+
+PREFETCHES = counter("prefetch_total",
+                     "Speculative prefetches by policy and outcome (issued, done, empty, failed, wasted)")
+PREFETCH_CLAIMS = counter("prefetch_claims_total", "Tool reads of prefetchable data by outcome (ready, joined, miss)")
+PREFETCH_SECONDS = histogram("prefetch_seconds", "Background prefetch duration")
+
+
+def prefetch_financial(user_id):
+    """Warms the financial profile cache; returns the claim keys it warmed."""
+    from firebase_tools import _financial_profile
+    return [user_id] if _financial_profile(user_id) else []
+
+
+def prefetch_location(user_id):
+    """
+    Reads users/{user_id} and, when it holds an address, warms the geocode
+    cache and makes sure the dealership index covers the area around it.
+    """
+    from firebase_tools import get_firestore_client
+    from dealer_index import geocode_address, get_dealer_index, seed_dealerships
+
+    with span(FIRESTORE_SECONDS, op="user_profile"):
+        snapshot = get_firestore_client().collection('users').document(user_id).get()
+    profile = snapshot.to_dict() if snapshot.exists else {}
+    address = next((str(profile[f]) for f in PROFILE_ADDRESS_FIELDS if profile.get(f)), None)
+    if address is None:
+        return []
+    location = geocode_address(address)
+    if location is None:
+        return []
+    if not get_dealer_index().covers(*location, DEALER_PREFETCH_RADIUS):
+        seed_dealerships(*location)
+    return [normalize_address(address)]
+
+
+POLICIES = {
+    "financial": prefetch_financial,
+    "location": prefetch_location,
+}
+
+
+class Prefetcher:
+    """
+    Runs speculative per-user reads in the background at session start so
+    the tools that need them later find warm caches.
+
+    Each policy warms one kind of data and reports the keys tools will ask
+    for (user id, normalized address). Tools claim a key before reading:
+    a finished prefetch counts as 'ready', one still running is waited on
+    (up to PREFETCH_WAIT) and counts as 'joined', anything else is a 'miss'.
+    Prefetches that expire unclaimed are counted as 'wasted'.
+    """
+
+    def __init__(self, policies=None, ttl=PREFETCH_TTL, wait=PREFETCH_WAIT, workers=PREFETCH_WORKERS):
+        self.policies = policies if policies is not None else {}
+        self.ttl = ttl
+        self.wait = wait
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._started = OrderedDict()  # (policy, user_id) -> expires_at
+        self._claims = OrderedDict()  # (policy, key) -> {"future", "expires_at", "used"}
+        self._stats = {}
+
+    def _policy_stats(self, policy):
+        return self._stats.setdefault(policy, {
+            "issued": 0, "done": 0, "empty": 0, "failed": 0, "wasted": 0, "ready": 0, "joined": 0, "miss": 0
+        })
+
+    def _count(self, policy, outcome):
+        self._policy_stats(policy)[outcome] += 1
+        metric = PREFETCH_CLAIMS if outcome in ("ready", "joined", "miss") else PREFETCHES
+        metric.inc(policy=policy, outcome=outcome)
+
+    def _expire(self, now):
+        while self._started and next(iter(self._started.values())) <= now:
+            self._started.popitem(last=False)
+        while self._claims and next(iter(self._claims.values()))["expires_at"] <= now:
+            (policy, _), entry = self._claims.popitem(last=False)
+            if not entry["used"]:
+                entry["used"] = True  # aliases share the entry; count it once
+                self._count(policy, "wasted")
+
+    def start(self, user_id: str):
+        """Kicks off every enabled policy for user_id unless it ran within the TTL."""
+        if not user_id or not self.policies:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+            for policy, fn in self.policies.items():
+                if (policy, user_id) in self._started:
+                    continue
+                self._started[(policy, user_id)] = now + self.ttl
+                future = self._executor.submit(self._run, policy, fn, user_id)
+                # The user id is a claim key up front so tools can join the in-flight read
+                self._claims[(policy, user_id)] = {"future": future, "expires_at": now + self.ttl, "used": False}
+                self._count(policy, "issued")
+
+    def _run(self, policy, fn, user_id):
+        try:
+            with span(PREFETCH_SECONDS, policy=policy):
+                keys = fn(user_id) or []
+        except Exception as e:
+            print(f"[Prefetch] {policy} for {user_id} failed: {e}")
+            with self._lock:
+                self._count(policy, "failed")
+                entry = self._claims.get((policy, user_id))
+                if entry is not None:
+                    entry["used"] = True  # already counted as failed, not wasted
+            raise
+        with self._lock:
+            entry = self._claims.get((policy, user_id))
+            if not keys:
+                # Nothing to warm (no profile, no saved address); not a wasted prefetch
+                self._count(policy, "empty")
+                if entry is not None:
+                    entry["used"] = True
+                return keys
+            self._count(policy, "done")
+            for key in keys:
+                if entry is not None:
+                    self._claims.setdefault((policy, key), entry)
+        return keys
+
+    def claim(self, policy: str, key):
+        """Called by a tool before it reads prefetchable data; waits for an in-flight prefetch."""
+        if not key or policy not in self.policies:
+            return
+        with self._lock:
+            entry = self._claims.get((policy, key))
+            if entry is None or entry["expires_at"] <= time.monotonic():
+                self._count(policy, "miss")
+                return
+            first_use = not entry["used"]
+            entry["used"] = True
+            future = entry["future"]
+        outcome = "ready" if future.done() else "joined"
+        try:
+            future.result(timeout=self.wait)
+        except Exception:
+            outcome = "miss"
+        if first_use or outcome == "miss":
+            with self._lock:
+                self._count(policy, outcome)
+
+    def stats(self) -> dict:
+        """Per-policy counters and how often a prefetch was actually used."""
+        with self._lock:
+            report = {}
+            for policy, s in self._stats.items():
+                useful = s["ready"] + s["joined"]
+                report[policy] = dict(s, use_rate=round(useful / s["done"], 4) if s["done"] else 0.0)
+            return report
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def policies_from_env(spec=PREFETCH_POLICIES) -> dict:
+    """Parses PREFETCH_POLICIES ("financial,location", "none") into policy functions."""
+    names = [name.strip() for name in spec.split(",") if name.strip() and name.strip() != "none"]
+    unknown = [name for name in names if name not in POLICIES]
+    if unknown:
+        raise ValueError(f"Unknown prefetch policies: {', '.join(unknown)}")
+    return {name: POLICIES[name] for name in names}
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    """Returns the process-wide prefetcher (singleton) configured from PREFETCH_POLICIES."""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher(policies_from_env())
+    return _prefetcher
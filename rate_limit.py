@@ -0,0 +1,263 @@
+# rate_limit.py
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from metrics import counter, gauge, histogram
+
+# Per upstream "rate,burst,concurrency": calls/s refill rate, bucket size, calls in flight.
+# Limits are per process; under serve.py divide the project quota by WEB_WORKERS.
+UPSTREAM_DEFAULTS = {
+    "gemini": "5,10,16",
+    "geocoding": "25,50,8",
+    "places": "5,10,4",
+}
+LIMITER_MAX_WAIT = float(os.getenv("LIMITER_MAX_WAIT", "5.0"))  # longest a caller queues
+LIMITER_BACKOFF = float(os.getenv("LIMITER_BACKOFF", "5.0"))  # pause after an upstream 429 without Retry-After
+
+UPSTREAM_QUEUE_DEPTH = gauge("upstream_queue_depth", "Calls waiting for upstream capacity")
+UPSTREAM_IN_FLIGHT = gauge("upstream_in_flight", "Calls currently running against an upstream")
+UPSTREAM_WAIT_SECONDS = histogram("upstream_wait_seconds", "Time a call queued before it was admitted")
+UPSTREAM_ADMISSIONS = counter("upstream_admissions_total",
+                              "Upstream admissions by outcome (admitted, queued, shed, timed_out, throttled)")
+
+# Who a call is made for and by when it must finish; set once per chat turn by chat_api
+current_user = ContextVar("rate_limit_user", default=None)
+current_deadline = ContextVar("rate_limit_deadline", default=None)
+
+
+class RateLimited(Exception):
+    """An upstream has no capacity for this call soon enough; retry after retry_after seconds."""
+
+    def __init__(self, upstream, retry_after):
+        self.upstream = upstream
+        self.retry_after = max(float(retry_after), 0.1)
+        super().__init__(f"{upstream} is over capacity, retry in {self.retry_after:.1f}s")
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header value, or None (HTTP dates are not used by Google APIs)."""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def request_scope(user_id, deadline=None):
+    """Attributes every upstream call in the block to user_id, with a monotonic deadline."""
+    user_token = current_user.set(user_id)
+    deadline_token = current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        current_deadline.reset(deadline_token)
+        current_user.reset(user_token)
+
+
+class UpstreamLimiter:
+    """
+    Token bucket plus concurrency cap for one upstream, with a fair queue.
+
+    A call starts at once when a token and a slot are free and nobody is
+    queued. Otherwise it queues if its estimated wait fits within both
+    LIMITER_MAX_WAIT and the caller's deadline, and is shed with
+    RateLimited(retry_after) right away if it does not. Queued calls are
+    admitted round-robin across users, so one user's burst cannot starve
+    the others. throttled() turns an upstream 429 into a pause for everyone.
+    """
+
+    def __init__(self, name, rate, burst, concurrency, max_wait=LIMITER_MAX_WAIT, backoff=LIMITER_BACKOFF):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.concurrency = int(concurrency)
+        self.max_wait = max_wait
+        self.backoff = backoff
+        self._cond = threading.Condition()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._hold_seconds = None  # moving average of call duration, for wait estimates
+        self._queues = OrderedDict()  # user -> deque of waiters, served round-robin
+        self._waiting = 0
+        self._stats = {"admitted": 0, "queued": 0, "shed": 0, "timed_out": 0, "throttled": 0}
+
+    def _count(self, outcome):
+        self._stats[outcome] += 1
+        UPSTREAM_ADMISSIONS.inc(upstream=self.name, outcome=outcome)
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _can_start(self, now):
+        return now >= self._paused_until and self._tokens >= 1 and self._in_flight < self.concurrency
+
+    def _estimate(self, now, position):
+        """Rough wait before the caller at queue position (0 = next) can start."""
+        wait = max(self._paused_until - now, 0.0)
+        deficit = position + 1 - self._tokens
+        if deficit > 0:
+            wait = max(wait, deficit / self.rate)
+        slots_ahead = self._in_flight + position + 1 - self.concurrency
+        if slots_ahead > 0 and self._hold_seconds:
+            wait = max(wait, self._hold_seconds * (slots_ahead / self.concurrency))
+        return wait
+
+    def _head(self):
+        return next(iter(self._queues.values()))[0] if self._queues else None
+
+    def _enqueue(self, user):
+        waiter = object()
+        self._queues.setdefault(user, deque()).append(waiter)
+        self._waiting += 1
+        UPSTREAM_QUEUE_DEPTH.set(self._waiting, upstream=self.name)
+        return waiter
+
+    def _dequeue(self, user, waiter):
+        queue = self._queues[user]
+        was_head = waiter is self._head()
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[user]
+        elif was_head:
+            self._queues.move_to_end(user)  # next user's turn
+        self._waiting -= 1
+        UPSTREAM_QUEUE_DEPTH.set(self._waiting, upstream=self.name)
+        self._cond.notify_all()
+
+    def _start(self):
+        self._tokens -= 1
+        self._in_flight += 1
+        UPSTREAM_IN_FLIGHT.set(self._in_flight, upstream=self.name)
+
+    def admit(self, user=None, deadline=None):
+        """Blocks until the call may start; raises RateLimited when it cannot start in time."""
+        user = user if user is not None else current_user.get() or "-"
+        deadline = deadline if deadline is not None else current_deadline.get()
+        start = time.monotonic()
+        limit = start + self.max_wait if deadline is None else min(start + self.max_wait, deadline)
+
+        with self._cond:
+            self._refill(start)
+            if not self._waiting and self._can_start(start):
+                self._start()
+                self._count("admitted")
+                UPSTREAM_WAIT_SECONDS.observe(0.0, upstream=self.name)
+                return
+            estimate = self._estimate(start, self._waiting)
+            if start + estimate > limit:
+                self._count("shed")
+                raise RateLimited(self.name, estimate)
+
+            self._count("queued")
+            waiter = self._enqueue(user)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._head() is waiter and self._can_start(now):
+                    self._dequeue(user, waiter)
+                    self._start()
+                    break
+                if now >= limit:
+                    self._dequeue(user, waiter)
+                    self._count("timed_out")
+                    raise RateLimited(self.name, self._estimate(now, self._waiting))
+                timeout = limit - now
+                if self._head() is waiter and self._in_flight < self.concurrency:
+                    # Only a token (or the end of a pause) is missing; sleep until it arrives
+                    timeout = min(timeout, max(self._estimate(now, 0), 0.001))
+                self._cond.wait(timeout)
+        UPSTREAM_WAIT_SECONDS.observe(time.monotonic() - start, upstream=self.name)
+
+    def release(self, held_seconds):
+        with self._cond:
+            self._in_flight -= 1
+            if self._hold_seconds is None:
+                self._hold_seconds = held_seconds
+            else:
+                self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * held_seconds
+            UPSTREAM_IN_FLIGHT.set(self._in_flight, upstream=self.name)
+            self._cond.notify_all()
+
+    @contextmanager
+    def acquire(self, user=None, deadline=None):
+        """Holds a slot of this upstream for the duration of the block."""
+        self.admit(user, deadline)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    @asynccontextmanager
+    async def acquire_async(self, user=None, deadline=None):
+        """acquire() for coroutines; queueing happens on a worker thread, not the event loop."""
+        admission = asyncio.ensure_future(asyncio.to_thread(self.admit, user, deadline))
+        try:
+            await asyncio.shield(admission)
+        except asyncio.CancelledError:
+            # The thread cannot be interrupted; hand back the slot if it is admitted after all
+            admission.add_done_callback(lambda f: f.exception() is None and self.release(0.0))
+            raise
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def throttled(self, retry_after=None) -> RateLimited:
+        """
+        Records that the upstream itself answered with a quota error: pauses
+        admissions for retry_after (or LIMITER_BACKOFF) seconds and returns
+        the RateLimited to raise.
+        """
+        retry_after = self.backoff if retry_after is None else retry_after
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._tokens = min(self._tokens, 0.0)
+            self._count("throttled")
+        return RateLimited(self.name, retry_after)
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill(time.monotonic())
+            return dict(self._stats, rate=self.rate, burst=self.burst, concurrency=self.concurrency,
+                        tokens=round(self._tokens, 2), in_flight=self._in_flight, waiting=self._waiting)
+
+
+def limits_from_env(name) -> tuple:
+    """(rate, burst, concurrency) from RATE_LIMIT_<NAME>, e.g. RATE_LIMIT_GEMINI="5,10,16"."""
+    spec = os.getenv(f"RATE_LIMIT_{name.upper()}", UPSTREAM_DEFAULTS[name])
+    try:
+        rate, burst, concurrency = (float(v) for v in spec.split(","))
+    except ValueError:
+        raise ValueError(f"RATE_LIMIT_{name.upper()} must be 'rate,burst,concurrency', got {spec!r}")
+    return rate, burst, int(concurrency)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> UpstreamLimiter:
+    """Returns the process-wide limiter for an upstream (gemini, geocoding, places)."""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = _limiters[name] = UpstreamLimiter(name, *limits_from_env(name))
+    return limiter
+
+
+def stats() -> dict:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
@@ -0,0 +1,220 @@
+# response_cache.py
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import counter
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))  # 0 disables the cache
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.9"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(6 * 3600)))
+VECTOR_DIM = 2 ** 12
+
+RESPONSE_CACHE = counter("response_cache_total", "Semantic response cache lookups by outcome (hit, miss, bypass, store)")
+
+# Messages that carry (or ask about) data tied to one user are never cached
+PERSONAL_DATA_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r"\S+@\S+\.\w+",                                   # email address
+    r"\d{3,}",                                         # ids, prices, credit scores, zip codes, street numbers
+    r"\b(?=\w*\d)\w{16,}\b",                           # opaque ids (Firebase uids)
+    r"\bmy\s+(user\s*id|id|credit|income|debt|address|zip|name|email|profile|account|finances?)\b",
+)]
+
+_PUNCTUATION = re.compile(r"[^\w\s$%]")
+
+
+def normalize_text(text: str) -> str:
+    """Lower-cases, drops punctuation and collapses whitespace."""
+    return " ".join(_PUNCTUATION.sub(" ", str(text).lower()).split())
+
+
+def _features(text):
+    words = text.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {text} "
+    features += [padded[i:i + n] for n in (3, 4) for i in range(len(padded) - n + 1)]
+    return features
+
+
+class HashedTfidfVectorizer:
+    """
+    Word uni/bigrams plus character 3/4-grams hashed into a fixed number of
+    signed buckets, sublinear TF times an IDF learned from stored messages,
+    L2-normalized. Needs no vocabulary and no external embedding service.
+    Not thread-safe: ResponseCache calls it under its lock.
+    """
+
+    def __init__(self, dim=VECTOR_DIM):
+        self.dim = dim
+        self._df = np.zeros(dim, dtype=np.float32)
+        self._docs = 0
+
+    def _counts(self, text):
+        features = _features(normalize_text(text))
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.int64)
+        signs = np.where((hashes // self.dim) & 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, (hashes % self.dim).astype(np.intp), signs)
+        return vector
+
+    def transform(self, text) -> np.ndarray:
+        counts = self._counts(text)
+        idf = np.log((1.0 + self._docs) / (1.0 + self._df)) + 1.0
+        vector = np.sign(counts) * np.log1p(np.abs(counts)) * idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def learn(self, text):
+        """Adds one document to the IDF statistics."""
+        self._df += self._counts(text) != 0
+        self._docs += 1
+
+
+def conversation_state(namespace: str, turns) -> str:
+    """Digest of the prompt namespace and every prior (role, text) turn."""
+    digest = hashlib.sha1(namespace.encode("utf-8"))
+    for role, text in turns:
+        digest.update(f"\x1e{role}\x1f{normalize_text(text)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_personal(message: str, user_id: str = None) -> bool:
+    """True when the message carries user-specific data and must not be cached."""
+    if user_id and user_id.lower() in message.lower():
+        return True
+    return any(pattern.search(message) for pattern in PERSONAL_DATA_PATTERNS)
+
+
+class ResponseCache:
+    """
+    Semantic cache of assistant replies.
+
+    An entry is (conversation state, message vector, reply). A lookup only
+    considers entries with the same state - the same prompt namespace and
+    the same prior turns - and returns the reply of the most similar
+    message when cosine similarity reaches the threshold. Vectors live in
+    one preallocated matrix so a lookup is a single NumPy mat-vec; slots
+    are recycled least-recently-used first.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, threshold=RESPONSE_CACHE_THRESHOLD,
+                 ttl=RESPONSE_CACHE_TTL, dim=VECTOR_DIM):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.vectorizer = HashedTfidfVectorizer(dim)
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._states = np.zeros(max_entries, dtype=np.uint64)
+        self._expires = np.zeros(max_entries, dtype=np.float64)  # 0 marks a free slot
+        self._replies = [None] * max_entries
+        self._lru = OrderedDict()  # slot -> None, least recently used first
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def _state_id(state):
+        return np.uint64(int(state[:15], 16))
+
+    def _count(self, outcome, stat):
+        self._stats[stat] += 1
+        RESPONSE_CACHE.inc(outcome=outcome)
+
+    def bypass(self):
+        """Records a turn that was not eligible for caching."""
+        with self._lock:
+            self._count("bypass", "bypassed")
+
+    def _best(self, state_id, vector, now):
+        candidates = np.flatnonzero((self._states == state_id) & (self._expires > now))
+        if not len(candidates):
+            return None, 0.0
+        similarities = self._vectors[candidates] @ vector
+        best = int(np.argmax(similarities))
+        return int(candidates[best]), float(similarities[best])
+
+    def lookup(self, state: str, message: str):
+        """Returns (reply, similarity) for a close enough cached message, else None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            vector = self.vectorizer.transform(message)
+            slot, similarity = self._best(self._state_id(state), vector, time.monotonic())
+            if slot is None or similarity < self.threshold:
+                self._count("miss", "misses")
+                return None
+            self._lru.move_to_end(slot)
+            self._count("hit", "hits")
+            return self._replies[slot], similarity
+
+    def store(self, state: str, message: str, reply: str):
+        """Caches reply for message in this conversation state."""
+        if not self.enabled or not reply:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # The IDF statistics are shared; learn and transform only under the lock
+            self.vectorizer.learn(message)
+            vector = self.vectorizer.transform(message)
+            state_id = self._state_id(state)
+            slot, similarity = self._best(state_id, vector, now)
+            if slot is None or similarity < self.threshold:
+                slot = self._free_slot(now)
+            self._vectors[slot] = vector
+            self._states[slot] = state_id
+            self._expires[slot] = now + self.ttl
+            self._replies[slot] = reply
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+            self._count("store", "stores")
+
+    def _free_slot(self, now):
+        if len(self._lru) < self.max_entries:
+            return len(self._lru)
+        expired = np.flatnonzero(self._expires <= now)
+        if len(expired):
+            slot = int(expired[0])
+        else:
+            slot = next(iter(self._lru))
+            self._stats["evictions"] += 1
+        del self._lru[slot]
+        return slot
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(self._stats, size=len(self._lru), max_entries=self.max_entries,
+                        threshold=self.threshold,
+                        hit_rate=round(self._stats["hits"] / lookups, 4) if lookups else 0.0)
+
+    def clear(self):
+        with self._lock:
+            self._expires[:] = 0
+            self._states[:] = 0
+            self._replies = [None] * self.max_entries
+            self._lru.clear()
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide response cache (singleton)."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,91 @@
+# serve.py
+"""
+Production entry point: the Flask app (chat Blueprint included) under
+gunicorn with a pre-forked pool of threaded workers.
+
+    python serve.py
+
+The app is imported once in the master (preload) and shared copy-on-write.
+Each worker then warms up its own Gemini model, Firestore client, catalog
+and session store after the fork, since gRPC clients must not cross a
+fork. /readyz answers 503 until the worker handling it is warm. SIGTERM
+stops accepting connections and lets in-flight turns finish for up to
+WEB_GRACEFUL_TIMEOUT seconds. /readyz describes the worker that served the
+request; /metrics sums every worker's samples from METRICS_DIR (each
+worker flushes there every METRICS_FLUSH_INTERVAL seconds).
+"""
+import multiprocessing
+import os
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+import metrics
+from app import create_app
+from chat import shut_down, warm_up
+
+PORT = os.getenv("PORT", "5000")
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+WEB_THREADS = int(os.getenv("WEB_THREADS", "8"))  # concurrent requests per worker
+WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", "120"))  # silent worker is killed and replaced
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+WEB_KEEPALIVE = int(os.getenv("WEB_KEEPALIVE", "5"))
+WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", "0"))  # recycle workers after N requests; 0 disables
+WEB_ACCESS_LOG = os.getenv("WEB_ACCESS_LOG", "-")
+METRICS_DIR = os.getenv("METRICS_DIR") or os.path.join(tempfile.gettempdir(), f"toyota-metrics-{PORT}")
+
+
+def post_fork(server, worker):
+    metrics.start_flusher()
+    try:
+        warm_up()
+    except Exception as e:
+        # Keep serving; /readyz reports the failed step and clients initialize lazily on first use
+        server.log.error(f"[Serve] Warm-up failed in worker {worker.pid}: {e}")
+    else:
+        server.log.info(f"[Serve] Worker {worker.pid} warm.")
+
+
+def worker_exit(server, worker):
+    shut_down()
+    metrics.flush()  # keep the exiting worker's final counts in the aggregate
+
+
+def gunicorn_options() -> dict:
+    return {
+        "bind": f"0.0.0.0:{PORT}",
+        "workers": WEB_WORKERS,
+        "worker_class": "gthread",
+        "threads": WEB_THREADS,
+        "timeout": WEB_TIMEOUT,
+        "graceful_timeout": WEB_GRACEFUL_TIMEOUT,
+        "keepalive": WEB_KEEPALIVE,
+        "max_requests": WEB_MAX_REQUESTS,
+        "max_requests_jitter": WEB_MAX_REQUESTS // 10,
+        "preload_app": True,
+        "accesslog": WEB_ACCESS_LOG or None,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+    }
+
+
+class ChatServer(BaseApplication):
+    """Runs a WSGI app under gunicorn configured from code instead of a config file."""
+
+    def __init__(self, application, options=None):
+        self.application = application
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+if __name__ == "__main__":
+    metrics.enable_multiprocess(METRICS_DIR)
+    ChatServer(create_app(warm_up=False), gunicorn_options()).run()
@@ -0,0 +1,180 @@
+# session_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.sqlite3")
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", str(2 * 3600)))
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "8000"))
+CHAT_KEEP_TURNS = int(os.getenv("CHAT_KEEP_TURNS", "6"))
+
+
+class SessionStore(ABC):
+    """
+    Conversation histories keyed by user_id. A history is a JSON-friendly
+    list of Content dicts ({"role": ..., "parts": [...]}).
+    """
+
+    @abstractmethod
+    def get(self, user_id: str):
+        """Returns the user's history, or None."""
+
+    @abstractmethod
+    def put(self, user_id: str, history: list):
+        """Replaces the user's history."""
+
+    @abstractmethod
+    def delete(self, user_id: str):
+        """Forgets the user's history."""
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store with LRU and idle-timeout eviction."""
+
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # user_id -> (history, last_access)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.idle_timeout:
+                del self._sessions[user_id]
+                return None
+            self._sessions[user_id] = (entry[0], time.time())
+            self._sessions.move_to_end(user_id)
+            return list(entry[0])
+
+    def put(self, user_id, history):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+            self._sessions[user_id] = (list(history), time.time())
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Out-of-process store shared by every worker on the host. Idle sessions
+    and the least recently used ones beyond max_sessions are pruned on write.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, max_sessions=SESSION_MAX_SESSIONS,
+                 idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "user_id TEXT PRIMARY KEY, history TEXT, updated_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)"
+            )
+
+    def get(self, user_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT history, updated_at FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.idle_timeout:
+            return None
+        return json.loads(row[0])
+
+    def put(self, user_id, history):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (user_id, json.dumps(history), now)
+            )
+            self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (now - self.idle_timeout,)
+            )
+            self._conn.execute(
+                "DELETE FROM sessions WHERE user_id IN ("
+                "SELECT user_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            )
+
+    def delete(self, user_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+
+
+def estimate_tokens(history: list) -> int:
+    """Rough prompt size: ~4 characters per token."""
+    return len(json.dumps(history)) // 4
+
+
+def _is_user_text(content):
+    return content.get("role") == "user" and any("text" in part for part in content.get("parts", []))
+
+
+def _summarize(content):
+    lines = []
+    for part in content.get("parts", []):
+        if part.get("text"):
+            text = " ".join(part["text"].split())
+            lines.append(f"{content.get('role', 'user')}: {text[:200]}")
+        elif "functionCall" in part:
+            lines.append(f"(called {part['functionCall'].get('name')})")
+    return lines
+
+
+def compact_history(history: list, token_budget=CHAT_TOKEN_BUDGET, keep_turns=CHAT_KEEP_TURNS) -> list:
+    """
+    Keeps the last keep_turns user turns verbatim once the history exceeds
+    token_budget. Older turns collapse into one short summary exchange
+    without tool payloads, so prompt size stops growing with chat length.
+    """
+    if estimate_tokens(history) <= token_budget:
+        return history
+
+    # Cut only at a user text message so call/response pairs stay together
+    turn_starts = [i for i, content in enumerate(history) if _is_user_text(content)]
+    if len(turn_starts) <= keep_turns:
+        return history
+    cut = turn_starts[-keep_turns]
+
+    summary = []
+    for content in history[:cut]:
+        summary.extend(_summarize(content))
+    return [
+        {"role": "user", "parts": [{"text": "Summary of our earlier conversation:\n" + "\n".join(summary)}]},
+        {"role": "model", "parts": [{"text": "Got it, I'll keep that in mind."}]},
+    ] + history[cut:]
+
+
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Returns the configured store (SESSION_STORE=sqlite|memory), created on first use."""
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                if SESSION_STORE == "memory":
+                    _session_store = MemorySessionStore()
+                else:
+                    _session_store = SqliteSessionStore()
+    return _session_store
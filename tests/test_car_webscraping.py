@@ -0,0 +1,85 @@
+import pytest
+
+pytest.importorskip("firebase_admin")
+pytest.importorskip("bs4")
+
+from car_webscraping import car_doc_id, content_hash, diff_catalog, retained_ids  # noqa: E402
+
+
+def _car(name="Camry", price=28000, **fields):
+    return {"name": name, "price": price, "mileages_or_ranges": "28/39 est. mpg", "make_year": "2025",
+            "powertrain": "Gasoline", "car_type": ["Cars & Minivan"], "car_image": "camry.png", **fields}
+
+
+def _stored(*cars, removed=False):
+    return {car_doc_id(car): (content_hash(car), removed, dict(car)) for car in cars}
+
+
+def test_content_hash_ignores_bookkeeping_fields():
+    car = _car()
+    assert content_hash(car) == content_hash(dict(car, removed=True, synced_at="2026-01-01T00:00:00Z"))
+    assert content_hash(car) == content_hash(dict(reversed(list(car.items()))))
+
+
+def test_content_hash_changes_with_scraped_content():
+    assert content_hash(_car()) != content_hash(_car(price=29000))
+    assert content_hash(_car()) != content_hash(_car(car_type=["SUVs"]))
+
+
+def test_diff_catalog_skips_unchanged_and_writes_changed():
+    camry, rav4 = _car(), _car("RAV4", 31000)
+    stored = _stored(camry, rav4)
+    scraped = {car_doc_id(camry): camry, car_doc_id(rav4): dict(rav4, price=32000)}
+
+    ops, changes = diff_catalog(scraped, stored)
+
+    assert [(op, doc_id) for op, doc_id, _ in ops] == [("set", car_doc_id(rav4))]
+    assert ops[0][2]["content_hash"] == content_hash(scraped[car_doc_id(rav4)])
+    assert changes["changed"][0]["fields"] == ["price"]
+    assert changes["added"] == [] and changes["removed"] == []
+
+
+def test_diff_catalog_restores_a_tombstoned_car():
+    camry = _car()
+    ops, changes = diff_catalog({car_doc_id(camry): camry}, _stored(camry, removed=True))
+
+    assert ops[0][:2] == ("set", car_doc_id(camry))
+    assert ops[0][2]["removed"] is False
+    assert changes["changed"][0]["restored"] is True
+    assert changes["changed"][0]["fields"] == []
+
+
+def test_diff_catalog_tombstones_legacy_duplicates():
+    camry = _car()
+    stored = _stored(camry)
+    stored["autogeneratedId"] = (content_hash(camry), False, dict(camry))
+
+    ops, changes = diff_catalog({car_doc_id(camry): camry}, stored)
+
+    assert ops == [("update", "autogeneratedId", {"removed": True, "removed_at": ops[0][2]["removed_at"]})]
+    assert changes["removed"][0]["duplicate_of"] == car_doc_id(camry)
+
+
+def test_diff_catalog_keeps_retained_cars_live():
+    camry, rav4, prius = _car(), _car("RAV4", 31000), _car("Prius", 29000)
+    stored = _stored(camry, rav4, prius)
+    scraped = {car_doc_id(camry): camry}
+
+    ops, changes = diff_catalog(scraped, stored, retained={car_doc_id(rav4)})
+
+    assert [(op, doc_id) for op, doc_id, _ in ops] == [("update", car_doc_id(prius))]
+    assert [entry["id"] for entry in changes["removed"]] == [car_doc_id(prius)]
+
+
+def test_diff_catalog_tombstones_nothing_when_retained_is_unknown():
+    camry, rav4 = _car(), _car("RAV4", 31000)
+    ops, changes = diff_catalog({car_doc_id(camry): camry}, _stored(camry, rav4), retained=None)
+
+    assert ops == [] and changes["removed"] == []
+
+
+def test_retained_ids_is_unknown_when_a_page_has_no_recorded_ids():
+    pages = {"a": {"etag": "1", "cars": ["x", "y"]}, "b": {"etag": "2", "cars": ["z"]}}
+    assert retained_ids(pages) == {"x", "y", "z"}
+    assert retained_ids(dict(pages, c=None)) is None
+    assert retained_ids(dict(pages, c={"etag": "3"})) is None
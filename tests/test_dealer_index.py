@@ -0,0 +1,143 @@
+import json
+import threading
+
+import pytest
+
+from dealer_index import DealershipIndex, haversine_m
+
+DALLAS = (32.7767, -96.7970)
+
+
+def _dealer(place_id, lat, lng):
+    return {"name": place_id, "address": "", "rating": 4.5, "place_id": place_id,
+            "location": {"lat": lat, "lng": lng}}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DealershipIndex(path=str(tmp_path / "dealerships.json"))
+
+
+def test_query_radius_is_nearest_first_and_bounded(index):
+    lat, lng = DALLAS
+    index.add_search(lat, lng, 50000, [
+        _dealer("far", lat + 0.3, lng),      # ~33 km
+        _dealer("near", lat + 0.01, lng),    # ~1 km
+        _dealer("mid", lat, lng + 0.1),      # ~9 km
+    ])
+
+    results = index.query_radius(lat, lng, 10000)
+
+    assert [d["place_id"] for d in results] == ["near", "mid"]
+    assert results[0]["distance_m"] == pytest.approx(
+        float(haversine_m(lat, lng, [lat + 0.01], [lng])[0]), abs=0.1)
+    assert [d["place_id"] for d in index.nearest(lat, lng, k=1)] == ["near"]
+
+
+def test_covers_only_circles_inside_a_complete_search(index):
+    lat, lng = DALLAS
+    assert not index.covers(lat, lng, 1000)
+
+    index.add_search(lat, lng, 50000, [_dealer("a", lat, lng)])
+
+    assert index.covers(lat, lng, 8000)
+    assert index.covers(lat + 0.1, lng, 8000)
+    assert not index.covers(lat + 0.5, lng, 8000)  # ~55 km away
+    assert not index.covers(lat, lng, 60000)
+
+
+def test_incomplete_search_adds_dealers_without_coverage(index):
+    lat, lng = DALLAS
+    index.add_search(lat, lng, 50000, [_dealer("a", lat, lng)], complete=False)
+
+    assert not index.covers(lat, lng, 1000)
+    assert len(index) == 1
+
+
+def test_complete_search_prunes_missing_dealers_inside_only(index):
+    lat, lng = DALLAS
+    index.add_search(lat, lng, 10000, [_dealer("gone", lat, lng), _dealer("kept", lat + 0.01, lng)])
+    index.add_search(lat + 1, lng, 10000, [_dealer("outside", lat + 1, lng)])
+
+    index.add_search(lat, lng, 10000, [_dealer("kept", lat + 0.01, lng)])
+
+    assert {d["place_id"] for d in index.query_radius(lat, lng, 200000)} == {"kept", "outside"}
+
+
+def test_truncated_search_does_not_prune(index):
+    lat, lng = DALLAS
+    index.add_search(lat, lng, 10000, [_dealer("a", lat, lng)])
+    index.add_search(lat, lng, 10000, [_dealer("b", lat, lng)], complete=False)
+
+    assert len(index) == 2
+
+
+def test_concurrent_add_search_saves_every_search(index):
+    lat, lng = DALLAS
+    errors = []
+
+    def seed(worker):
+        try:
+            for i in range(50):
+                index.add_search(lat + worker, lng + i * 0.05, 1000,
+                                 [_dealer(f"{worker}-{i}", lat + worker, lng + i * 0.05)])
+        except Exception as e:  # pragma: no cover - the failure being tested for
+            errors.append(e)
+
+    threads = [threading.Thread(target=seed, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with open(index.path) as f:
+        data = json.load(f)
+    assert len(data["dealerships"]) == 200
+    assert len(data["coverage"]) == 200
+
+
+def test_searches_from_other_workers_are_kept(tmp_path):
+    path = str(tmp_path / "dealerships.json")
+    lat, lng = DALLAS
+    first, second = DealershipIndex(path=path), DealershipIndex(path=path)
+
+    first.add_search(lat, lng, 10000, [_dealer("a", lat, lng)])
+    second.add_search(lat + 1, lng, 10000, [_dealer("b", lat + 1, lng)])
+
+    reloaded = DealershipIndex(path=path)
+    assert reloaded.covers(lat, lng, 5000) and reloaded.covers(lat + 1, lng, 5000)
+    assert len(reloaded) == 2
+
+
+@pytest.mark.parametrize("module", ["tools", "firebase_tools"])
+def test_dealership_tool_reuses_the_index_for_covered_areas(module, tmp_path, monkeypatch):
+    import importlib
+
+    import dealer_index
+    from geo_cache import GeoCache
+
+    lat, lng = DALLAS
+    calls = []
+
+    def fake_maps_get(upstream, url):
+        calls.append(upstream)
+        if upstream == "geocoding":
+            return {"status": "OK", "results": [{"geometry": {"location": {"lat": lat, "lng": lng}}}]}
+        return {"status": "OK", "results": [
+            {"name": "Toyota of Dallas", "vicinity": "", "rating": 4.5, "place_id": "near",
+             "geometry": {"location": {"lat": lat + 0.01, "lng": lng}}},
+        ]}
+
+    monkeypatch.setattr(dealer_index, "maps_get", fake_maps_get)
+    monkeypatch.setattr(dealer_index, "get_geo_cache", lambda: GeoCache(path=":memory:"))
+    monkeypatch.setattr(dealer_index, "_dealer_index", DealershipIndex(path=str(tmp_path / "d.json")))
+    tool = importlib.import_module(module).find_toyota_dealerships
+    find = getattr(tool, "func", tool)
+
+    first = find("1 Main St, Dallas, TX", radius=5000)
+    second = find("2 Elm St, Dallas, TX", radius=8000)
+
+    assert [d["place_id"] for d in first["dealerships"]] == ["near"]
+    assert [d["place_id"] for d in second["dealerships"]] == ["near"]
+    assert calls == ["geocoding", "places", "geocoding"]
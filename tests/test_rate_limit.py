@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from rate_limit import RateLimited, UpstreamLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only rate_limit sees the fake clock; asyncio and Condition.wait keep real time
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def _wait_for(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+def test_queued_calls_are_admitted_round_robin_across_users(clock):
+    limiter = UpstreamLimiter("test", rate=100, burst=100, concurrency=1, max_wait=60)
+    limiter.admit("holder")
+    order = []
+
+    def call(user, name):
+        limiter.admit(user)
+        order.append(name)
+        limiter.release(0.0)
+
+    threads = []
+    for user, name in (("alice", "a1"), ("alice", "a2"), ("alice", "a3"), ("bob", "b1")):
+        thread = threading.Thread(target=call, args=(user, name))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: limiter.stats()["waiting"] == len(threads))
+
+    limiter.release(0.0)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["a1", "b1", "a2", "a3"]
+    assert limiter.stats()["queued"] == 4
+
+
+def test_call_queues_when_the_estimated_wait_fits(clock):
+    limiter = UpstreamLimiter("test", rate=1, burst=1, concurrency=10, max_wait=2)
+    limiter.admit("u")
+    admitted = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.admit("u"), admitted.set()))
+    thread.start()
+    _wait_for(lambda: limiter.stats()["waiting"] == 1)
+    assert not admitted.is_set()
+
+    clock.now += 1.0  # one token refilled
+    with limiter._cond:
+        limiter._cond.notify_all()
+    thread.join(5)
+
+    assert admitted.is_set()
+    assert limiter.stats()["queued"] == 1 and limiter.stats()["shed"] == 0
+
+
+def test_call_is_shed_when_the_wait_exceeds_max_wait_or_deadline(clock):
+    limiter = UpstreamLimiter("test", rate=1, burst=1, concurrency=10, max_wait=0.5)
+    limiter.admit("u")
+
+    with pytest.raises(RateLimited) as shed:
+        limiter.admit("u")
+    assert shed.value.retry_after == pytest.approx(1.0)
+
+    limiter.max_wait = 5
+    with pytest.raises(RateLimited):
+        limiter.admit("u", deadline=clock.now + 0.5)
+    assert limiter.stats()["shed"] == 2 and limiter.stats()["waiting"] == 0
+
+
+def test_throttled_pauses_admissions_for_retry_after(clock):
+    limiter = UpstreamLimiter("test", rate=10, burst=10, concurrency=10, max_wait=1)
+
+    error = limiter.throttled(3.0)
+    assert isinstance(error, RateLimited) and error.retry_after == 3.0
+
+    with pytest.raises(RateLimited) as shed:
+        limiter.admit("u")
+    assert shed.value.retry_after == pytest.approx(3.0)
+
+    clock.now += 3.1
+    limiter.admit("u")
+    assert limiter.stats()["in_flight"] == 1
+
+
+def test_throttled_without_retry_after_uses_the_backoff(clock):
+    limiter = UpstreamLimiter("test", rate=10, burst=10, concurrency=10, max_wait=1, backoff=7)
+    assert limiter.throttled().retry_after == 7
+
+
+def test_cancelled_async_waiter_returns_its_slot(clock):
+    limiter = UpstreamLimiter("test", rate=100, burst=100, concurrency=1, max_wait=60)
+    limiter.admit("holder")
+
+    async def scenario():
+        async def call():
+            async with limiter.acquire_async("u"):
+                pass
+
+        task = asyncio.ensure_future(call())
+        while limiter.stats()["waiting"] == 0:
+            await asyncio.sleep(0.005)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        limiter.release(0.0)  # the holder leaves; the abandoned admission gets the slot
+        for _ in range(1000):
+            stats = limiter.stats()
+            if stats["waiting"] == 0 and stats["in_flight"] == 0:
+                break
+            await asyncio.sleep(0.005)
+
+    asyncio.run(scenario())
+    stats = limiter.stats()
+    assert (stats["in_flight"], stats["waiting"]) == (0, 0)
@@ -0,0 +1,145 @@
+# tool_dispatcher.py
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from metrics import TOOL_CALLS
+
+TOOL_CACHE_SIZE = 2048
+
+
+def normalize_args(args: dict) -> dict:
+    """Default key normalization: trims/lower-cases strings, drops empty values, 60000.0 -> 60000."""
+    normalized = {}
+    for name, value in args.items():
+        if isinstance(value, str):
+            value = " ".join(value.split()).lower()
+        elif isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif isinstance(value, (list, tuple)):
+            value = [int(v) if isinstance(v, float) and v.is_integer() else v for v in value]
+        if value is None or value == "" or value == []:
+            continue
+        normalized[name] = value
+    return normalized
+
+
+class CachePolicy:
+    """How a tool's results are cached: TTL, key normalization, or not at all."""
+
+    def __init__(self, ttl=300.0, normalize=normalize_args, cacheable=True):
+        self.ttl = ttl
+        self.normalize = normalize
+        self.cacheable = cacheable
+
+
+NO_CACHE = CachePolicy(cacheable=False)
+
+
+class ToolDispatcher:
+    """
+    Memoizing, single-flight front for tool execution. Identical calls
+    (after per-tool argument normalization) within the TTL are answered
+    from cache; concurrent identical calls share one execution.
+    """
+
+    def __init__(self, execute, policies=None, max_entries=TOOL_CACHE_SIZE):
+        self._execute = execute
+        self.policies = policies or {}
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # key -> (result, expires_at, exec_seconds)
+        self._inflight = {}  # key -> Future
+        self._stats = {}
+
+    def _tool_stats(self, tool_name):
+        return self._stats.setdefault(tool_name, {
+            "calls": 0, "hits": 0, "shared": 0, "executions": 0,
+            "exec_seconds": 0.0, "saved_seconds": 0.0
+        })
+
+    def call(self, tool_name: str, args: dict):
+        policy = self.policies.get(tool_name, NO_CACHE)
+        if not policy.cacheable:
+            with self._lock:
+                self._tool_stats(tool_name)["calls"] += 1
+            return self._run(tool_name, args)
+
+        key = (tool_name, json.dumps(policy.normalize(args), sort_keys=True, default=str))
+        now = time.monotonic()
+        with self._lock:
+            stats = self._tool_stats(tool_name)
+            stats["calls"] += 1
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] > now:
+                self._cache.move_to_end(key)
+                stats["hits"] += 1
+                stats["saved_seconds"] += entry[2]
+                TOOL_CALLS.inc(tool=tool_name, outcome="hit")
+                return copy.deepcopy(entry[0])
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                stats["shared"] += 1
+                TOOL_CALLS.inc(tool=tool_name, outcome="shared")
+
+        if not owner:
+            result, elapsed = future.result()
+            with self._lock:
+                stats["saved_seconds"] += elapsed
+            return copy.deepcopy(result)
+
+        start = time.perf_counter()
+        try:
+            result = self._run(tool_name, args)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            del self._inflight[key]
+            # Tools report failures as {"error": ...}; never cache those
+            if not (isinstance(result, dict) and "error" in result):
+                self._cache[key] = (result, time.monotonic() + policy.ttl, elapsed)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        future.set_result((result, elapsed))
+        return copy.deepcopy(result)
+
+    def _run(self, tool_name, args):
+        TOOL_CALLS.inc(tool=tool_name, outcome="executed")
+        start = time.perf_counter()
+        try:
+            return self._execute(tool_name, args)
+        finally:
+            with self._lock:
+                stats = self._tool_stats(tool_name)
+                stats["executions"] += 1
+                stats["exec_seconds"] += time.perf_counter() - start
+
+    def invalidate(self, tool_name=None):
+        """Drops cached results for one tool, or for all tools."""
+        with self._lock:
+            for key in [k for k in self._cache if tool_name is None or k[0] == tool_name]:
+                del self._cache[key]
+
+    def stats(self) -> dict:
+        """Per-tool hit rate and time saved by cache hits and shared executions."""
+        with self._lock:
+            report = {}
+            for tool_name, s in self._stats.items():
+                report[tool_name] = dict(
+                    s,
+                    hit_rate=round((s["hits"] + s["shared"]) / s["calls"], 4) if s["calls"] else 0.0,
+                    avg_exec_seconds=round(s["exec_seconds"] / s["executions"], 4) if s["executions"] else 0.0
+                )
+            return report
@@ -4,7 +4,11 @@ from firebase_admin import credentials
 import os
 from dotenv import load_dotenv
 from langchain.tools import tool
-import requests
+from catalog import get_catalog
+from financial_cache import get_financial_cache
+from financing import finance_quotes, lease_quotes
+from dealer_index import get_dealer_index, geocode_address, seed_dealerships, DEALER_SEED_RADIUS
+from rate_limit import RateLimited
 
 
 load_dotenv()
@@ -13,7 +17,6 @@ load_dotenv()
 SERVICE_ACCOUNT_KEY_PATH = os.getenv("SERVICE_ACCOUNT_KEY_PATH")
 FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
 DATABASE_URL = f'https://{FIREBASE_PROJECT_ID}-default-rtdb.firebaseio.com/'
-MAP_API_KEY = os.getenv("MAP_API")
 
 
 def initialize_firebase_sdk():
@@ -34,12 +37,9 @@ def initialize_firebase_sdk():
            })
            print("Firebase Admin SDK initialized successfully!")
        except FileNotFoundError:
-           print(f"Error: Service account key file not found at path:")
-           print(f"{SERVICE_ACCOUNT_KEY_PATH}")
-           exit(1)
+           raise RuntimeError(f"Service account key file not found at path: {SERVICE_ACCOUNT_KEY_PATH}")
        except Exception as e:
-           print(f"Error initializing Firebase Admin SDK: {e}")
-           exit(1)
+           raise RuntimeError(f"Error initializing Firebase Admin SDK: {e}") from e
 
 
 db_client = None
@@ -65,84 +65,55 @@ def get_firestore_client():
 
 
 
-def find_cars(car_type: str, max_price: int, make_year: str, powertrain: str) -> dict:
+def find_cars(car_type: str = None, max_price: int = None, make_year: str = None,
+              powertrain: str = None, min_range: float = None, select: list = None,
+              sort: str = "price_asc", limit: int = 10, cursor: str = None) -> dict:
    """
-   Queries the Firestore 'cars' collection based on specified criteria.
+   Queries the in-memory catalog of the Firestore 'cars' collection based
+   on specified criteria.
    This function is designed to be the "tool" an AI can call.
 
 
    Args:
-       car_type (str, optional): The type of car (e.g., "Trucks", "SUV").
+       car_type (str, optional): The type of car (e.g., "Trucks", "SUV"); matched
+           loosely against stored values (synonyms, plurals, typos).
        max_price (int, optional): The maximum price. Assumes 'price' is a number.
-       make_year (str, optional): The make year (e.g., "2025").
+       make_year (str, optional): The make year (e.g., "2025" or 2025).
        powertrain (str, optional): The powertrain type (e.g., "Hybrid EV Available").
+       min_range (float, optional): Minimum electric range in miles (e.g., 300).
+       select (list, optional): Fields to return (default: everything but car_image).
+       sort (str, optional): "price_asc" (default) or "price_desc".
+       limit (int, optional): Page size (default 10, max 50).
+       cursor (str, optional): The next_cursor of a previous page.
 
 
    Returns:
-       list: A list of dictionaries, where each dictionary is a car
-             that matches the criteria.
+       dict: total_matches, the page of matching cars, next_cursor
+             (None on the last page) and resolved_filters.
    """
    try:
-       db = get_firestore_client()
+       catalog = get_catalog(get_firestore_client())
+       result = catalog.search(car_type=car_type, max_price=max_price,
+                               make_year=make_year, powertrain=powertrain, min_range=min_range,
+                               select=select, descending=(sort == "price_desc"),
+                               limit=limit, cursor=cursor)
 
 
-       query_ref = db.collection('cars')
-
-
-       if car_type:
-           print(f"[Query] Filtering by car_type array-contains '{car_type}'")
-           query_ref = query_ref.where(
-               field_path="car_type", op_string="array_contains", value=car_type
-           )
-
-
-       if make_year:
-           print(f"[Query] Filtering by make_year == '{make_year}'")
-           query_ref = query_ref.where(
-               field_path="make_year", op_string="==", value=make_year
-           )
-
-
-       if powertrain:
-           print(f"[Query] Filtering by powertrain == '{powertrain}'")
-           query_ref = query_ref.where(
-               field_path="powertrain", op_string="==", value=powertrain
-           )
-
-
-       if max_price is not None:
-           print(f"[Query] Filtering by price <= {max_price}")
-           query_ref = query_ref.where(
-               field_path="price", op_string="<=", value=max_price
-           )
-
-
-       docs = query_ref.stream()
-
-
-       matched_cars = []
-       for doc in docs:
-           car_data = doc.to_dict()
-           car_data['id'] = doc.id
-
-
-           matched_cars.append(car_data)
-
-
-       print(f"[Result] Found {len(matched_cars)} matching cars.")
-       return matched_cars
+       print(f"[Result] Found {result['total_matches']} matching cars.")
+       return result
 
 
    except Exception as e:
        print(f"An error occurred while finding cars: {e}")
-       return []
+       return {"error": str(e)}
 
 
 
 
 def get_financial_information(user_id: str) -> dict:
    """
-   Retrieves financial information from Firestore for a given user.
+   Retrieves financial information from Firestore for a given user,
+   served from the per-user financial profile cache.
   
    Args:
        user_id (str): The unique user identifier.
@@ -151,26 +122,8 @@ def get_financial_information(user_id: str) -> dict:
        dict: A dictionary containing annual_income, debt_to_income_ratio, credit_score, and user_id.
    """
    try:
-       db = get_firestore_client()
-
-
-       # Build the path to the subcollection
-       # collection('users') -> document('USER_ID') -> collection('financial')
-       financial_ref = db.collection('users').document(user_id).collection('financial')
-
-
-       # Get all documents from that subcollection
-       docs = financial_ref.stream()
-       financial_data = {}
-
-
-       for doc in docs:
-           data = doc.to_dict()
-           financial_data["annual_income"] = data["annualIncome"]
-           financial_data["debt_to_income_ratio"] = data["debtToIncomeRatio"]
-           financial_data["credit_score"] = data["creditScore"]
-           financial_data["user_id"] = user_id
-           return financial_data
+       # Reads users/USER_ID/financial/data, the doc saveFinancialData writes.
+       return get_financial_cache().get(get_firestore_client(), user_id)
 
 
    except Exception as e:
@@ -186,52 +139,39 @@ def get_financial_information(user_id: str) -> dict:
 # 0 = total money; 1 = down payment; 2 = time
 
 def find_toyota_dealerships(address: str, radius: int = 8000) -> dict:
-    """
-    Uses Google Maps Geocoding + Places API to find nearby Toyota dealerships based on user address.
-
-    Args:
-        address (str): The user's address (e.g., '123 Main St, Dallas, TX').
-        radius (int, optional): Search radius in meters (default: 8000 = 8 km).
-
-    Returns:
-        dict: A dictionary with query location and nearby Toyota dealership info.
-    """
-    try:
-        # Step 1: Convert address → latitude & longitude
-        geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={MAP_API_KEY}"
-        geocode_response = requests.get(geocode_url).json()
-
-        if geocode_response["status"] != "OK":
-            return {"error": f"Geocoding failed: {geocode_response.get('status')}"}
-
-        location = geocode_response["results"][0]["geometry"]["location"]
-        lat, lng = location["lat"], location["lng"]
-
-        # Step 2: Find nearby Toyota dealerships
-        place_url = (
-            "https://maps.googleapis.com/maps/api/place/nearbysearch/json?"
-            f"location={lat},{lng}&radius={radius}&type=car_dealer&keyword=Toyota dealership&key={MAP_API_KEY}"
-        )
-        place_response = requests.get(place_url).json()
-
-        dealerships = []
-        for place in place_response.get("results", []):
-            dealerships.append({
-                "name": place.get("name"),
-                "address": place.get("vicinity"),
-                "rating": place.get("rating"),
-                "place_id": place.get("place_id"),
-                "location": place.get("geometry", {}).get("location", {})
-            })
-
-        return {
-            "query_location": {"latitude": lat, "longitude": lng},
-            "dealerships_found": len(dealerships),
-            "dealerships": dealerships
-        }
-
-    except Exception as e:
-        return {"error": str(e)}
+   """
+   Finds Toyota dealerships near a user address, nearest first. Answered from
+   the local dealership index; only areas it has never covered hit the Places API.
+
+   Args:
+      address (str): The user's address (e.g., '123 Main St, Dallas, TX').
+      radius (int, optional): Search radius in meters (default: 8000 = 8 km).
+
+   Returns:
+      dict: A dictionary with query location and nearby Toyota dealership info.
+   """
+   try:
+      location = geocode_address(address)
+      if location is None:
+         return {"error": "Geocoding failed"}
+      lat, lng = location
+      radius = min(int(radius or 8000), DEALER_SEED_RADIUS)
+
+      index = get_dealer_index()
+      if not index.covers(lat, lng, radius):
+         seed_dealerships(lat, lng)
+      dealerships = index.query_radius(lat, lng, radius)
+
+      return {
+         "query_location": {"latitude": lat, "longitude": lng},
+         "dealerships_found": len(dealerships),
+         "dealerships": dealerships
+      }
+
+   except RateLimited:
+      raise
+   except Exception as e:
+      return {"error": str(e)}
     
 def getInterestRate(creditScore):
     match creditScore:
@@ -248,32 +188,23 @@ def getInterestRate(creditScore):
             case _:  # Default case
                 raise ValueError("Invalid credit score")
         
-print(find_cars(car_type="suvs", max_price=60000, make_year="2025", powertrain="Gasoline"))
-        
 def all_tools():
    """Return all tools (async + sync safe for LangChain agent use)."""
    return [find_cars, get_financial_information, find_toyota_dealerships]
 
 def financialPlan(typeOfPayment,userId, *price):
-    financial_data = get_financial_information(userId)
     if "cash" in typeOfPayment.lower():
         return {"Total Payment": price[0]}
     else:
-        creditScore = financial_data["credit_score"]
+        apr = getInterestRate(get_financial_information(userId)["credit_score"])
         if "finance" in typeOfPayment.lower():
-            monthlyInterestRate = getInterestRate(creditScore)/12
-            return {"Total Payment": round(((price[0]-price[1])*monthlyInterestRate)/(1-(1+monthlyInterestRate)**-price[2])*price[2],2) + price[1], "Down Payment": price[1], "Monthly Payment": round(((price[0]-price[1])*monthlyInterestRate)/(1-(1+monthlyInterestRate)**-price[2]),2)}
-        # if "lease" in typeOfPayment.lower():
-        #     cap_cost = price[0] - price[1]  # capitalized cost after down payment
-        #     residual = price[0] * 0.55      # assume 55% residual value
-        #     money_factor = getInterestRate() / 2400
-        #     depreciation_fee = (cap_cost - residual) / price[2]
-        #     finance_fee = (cap_cost + residual) * money_factor
-        #     monthlyPayment = depreciation_fee + finance_fee
-        #     totalPayment = round(monthlyPayment * price[2], 2) + price[1]
-        #     return {
-        #         "Total Payment": totalPayment,
-        #         "Down Payment": price[1],
-        #         "Monthly Payment": round(monthlyPayment, 2),
-        #         "Residual Value": round(residual, 2)
-        #     }
\ No newline at end of file
+            quote = finance_quotes([price[0]], [price[1]], [price[2]], [apr])
+            return {"Total Payment": float(quote["total"].item()), "Down Payment": price[1], "Monthly Payment": float(quote["monthly"].item())}
+        if "lease" in typeOfPayment.lower():
+            quote = lease_quotes([price[0]], [price[1]], [price[2]], [apr])
+            return {
+                "Total Payment": float(quote["total"].item()),
+                "Down Payment": price[1],
+                "Monthly Payment": float(quote["monthly"].item()),
+                "Residual Value": float(quote["residual"].item())
+            }